@@ -0,0 +1,45 @@
+# Measure the memory cost (bytes per item) of declared remote items
+import gc
+import time
+import tracemalloc
+
+from digimat.saia import SAIANode
+
+COUNT=10000
+
+
+def declare(server):
+    server.registers.declareRange(0, COUNT)
+    server.flags.declareRange(0, COUNT)
+
+
+def drain(server):
+    # simulate the processing of the initial (declare) pending reads
+    while server.memory.getNextPendingPull():
+        pass
+    for items in server.memory:
+        items.manager()
+
+
+node=SAIANode(253, port=15099, autostart=False)
+node.isIpAddressLocal=lambda ip: False
+
+t0=time.time()
+declare(node.servers.declare('192.168.0.251', lid=251))
+print('%d items declared in %.3fs' % (2*COUNT, time.time()-t0))
+
+server=node.servers.declare('192.168.0.250', lid=250)
+gc.collect()
+tracemalloc.start()
+snapshot0=tracemalloc.take_snapshot()
+
+declare(server)
+gc.collect()
+snapshot1=tracemalloc.take_snapshot()
+drain(server)
+gc.collect()
+snapshot2=tracemalloc.take_snapshot()
+
+for (title, snapshot) in (('declared', snapshot1), ('idle', snapshot2)):
+    size=sum(stat.size_diff for stat in snapshot.compare_to(snapshot0, 'filename'))
+    print('%s: %d bytes, %.0f bytes/item' % (title, size, size/(2*COUNT)))
@@ -0,0 +1,35 @@
+# Measure the local node responder throughput (read requests served per second, one core)
+import time
+import struct
+
+from digimat.saia import SAIANode
+from digimat.saia.request import SAIARequest
+from digimat.saia.request import SAIASBusCRC
+
+COUNT=20000
+
+
+def frame(sequence, lid, command, index, count):
+    payload=struct.pack('>BBBH', lid, command, count-1, index)
+    data=struct.pack('>LBBHB', 11+len(payload), 0, 0, sequence, 0)+payload
+    return data+struct.pack('>H', SAIASBusCRC(data))
+
+
+node=SAIANode(253, port=15099, autostart=False)
+for index in range(1024):
+    node.registers[index].value=index
+    node.flags[index].value=(index % 3==0)
+
+replies=[]
+node.sendMessageToHost=lambda data, host, port=None: replies.append(data)
+
+for (title, command, count) in (('registers', SAIARequest.COMMAND_READ_REGISTERS, 32),
+        ('flags', SAIARequest.COMMAND_READ_FLAGS, 256)):
+    frames=[frame(n & 0xffff, 253, command, (n*count) % 1024, count) for n in range(COUNT)]
+    del replies[:]
+    t0=time.time()
+    for data in frames:
+        node.processMessage(data, ('127.0.0.1', 5050))
+    elapsed=time.time()-t0
+    assert len(replies)==COUNT
+    print('READ %s x%d: %d requests/s (%.1fus/request)' % (title, count, COUNT/elapsed, elapsed/COUNT*1e6))
@@ -0,0 +1,57 @@
+# Check the whole frame refusal of the local node WRITE_FLAGS/WRITE_OUTPUTS handlers
+import struct
+from digimat.saia import SAIANode
+from digimat.saia.node import SAIAHandler_WRITE_FLAGS, SAIAHandler_WRITE_OUTPUTS
+from digimat.saia.response import SAIAResponseACK
+
+
+def write(handler, index, bits):
+    """
+    invoke the handler with a frame setting the given bits (list of 0/1) from index
+    """
+    data=bytearray((len(bits)+7)//8)
+    for n in range(len(bits)):
+        if bits[n]:
+            data[n >> 3]|=1 << (n & 7)
+    frame=struct.pack('>BHB', len(data)+2, index, len(bits)-1)+bytes(data)
+    return isinstance(handler.invoke(1, frame), SAIAResponseACK)
+
+
+node=SAIANode(253, port=15098, autostart=False)
+memory=node.memory
+flags=memory.flags
+handler=SAIAHandler_WRITE_FLAGS(node)
+
+assert write(handler, 10, [1, 0, 1])
+assert [flags[n].value for n in (10, 11, 12)]==[True, False, True]
+print('declared on the fly: ok')
+
+# beyond the address space, nothing is written (was ACKed with the last bits dropped)
+count=flags.count()
+assert not write(handler, 65530, [1]*8)
+assert flags.count()==count and not flags.item(65530)
+print('beyond size: ok')
+
+# not declared items without on the fly creation
+memory.enableOnTheFlyItemCreation(False)
+assert not write(handler, 100, [1, 1])
+assert not flags.item(100)
+assert write(handler, 10, [0, 1, 0])
+assert [flags[n].value for n in (10, 11, 12)]==[False, True, False]
+print('not declared: ok')
+
+# the items count limit is checked for the whole frame
+memory.enableOnTheFlyItemCreation(True, maxItems=flags.count()+4)
+assert not write(handler, 200, [1]*8)
+assert not flags.item(200)
+assert write(handler, 200, [1]*4)
+print('items limit: ok')
+
+# truncated frame
+memory.enableOnTheFlyItemCreation(True)
+outputs=memory.outputs
+handler=SAIAHandler_WRITE_OUTPUTS(node)
+assert not isinstance(handler.invoke(1, struct.pack('>BHB', 3, 0, 15)+b'\xff'), SAIAResponseACK)
+assert not outputs.item(8)
+assert write(handler, 0, [1]*16) and outputs[15].value
+print('outputs: ok')
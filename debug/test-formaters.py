@@ -0,0 +1,35 @@
+# Check that the numpy and struct encodeMany paths agree on non finite and out of range values, without warnings
+import warnings
+import digimat.saia.formaters as formaters
+from digimat.saia.formaters import SAIAValueFormaterFloat32, SAIAValueFormaterSwappedFloat32
+from digimat.saia.formaters import SAIAValueFormaterInteger10, SAIAValueFormaterFFP
+
+assert formaters.numpy is not None, 'numpy is required by this test'
+warnings.simplefilter('error')
+
+
+def encode(formater, values, vectorized):
+    backup=formaters.numpy
+    if not vectorized:
+        formaters.numpy=None
+    try:
+        return [int(value) for value in formater.encodeMany(values)]
+    except (ValueError, OverflowError) as e:
+        return type(e)
+    finally:
+        formaters.numpy=backup
+
+
+values=[float('nan'), float('inf'), -float('inf'), 1e39, -1e39, 3e9, -3e9, 1.55, -21.3, 0.0]
+for formater in (SAIAValueFormaterFloat32(), SAIAValueFormaterSwappedFloat32(),
+        SAIAValueFormaterInteger10(), SAIAValueFormaterFFP()):
+    for value in values:
+        result=encode(formater, [value], False)
+        assert encode(formater, [value], True)==result, (formater, value)
+        if type(result)==list:
+            assert result==[formater.encode(value)], (formater, value)
+
+assert encode(SAIAValueFormaterInteger10(), [1.0, float('nan')], True)==ValueError
+assert encode(SAIAValueFormaterFFP(), [float('inf')], True)==ValueError
+assert encode(SAIAValueFormaterFloat32(), [float('inf')], True)==[0x7f800000]
+print('formaters: ok')
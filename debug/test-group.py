@@ -0,0 +1,35 @@
+# Check that a closed (untracked) group is no more referenced by the items collections
+import gc
+import weakref
+
+from digimat.saia import SAIANode
+
+node=SAIANode(253, port=15099, autostart=False)
+node.isIpAddressLocal=lambda ip: False
+server=node.servers.declare('192.168.0.251', lid=251)
+registers=server.registers
+
+items=registers.declareRange(0, 10)
+for item in items:
+    item.setValue(0)
+
+changes=[]
+group=node.group(items)
+group.onChange(changes.append)
+items[3].setValue(5)
+assert group.changed()==[items[3]] and len(changes)==1
+assert registers.subscribers(3)
+
+group.close()
+assert not registers.subscribers(3)
+assert not registers._subscribed
+items[3].setValue(6)
+assert len(changes)==1
+
+ref=weakref.ref(group)
+del group
+gc.collect()
+assert ref() is None
+print('group released: ok')
+
+node.stop()
@@ -0,0 +1,36 @@
+# Check that a circuit breaker probe ending without response (NAK) re-opens the breaker
+import time
+
+from digimat.saia import SAIANode
+
+node=SAIANode(253, port=15099, autostart=False)
+node.isIpAddressLocal=lambda ip: False
+node.sendMessageToHost=lambda data, host, port=None: True
+
+server=node.servers.declare('192.168.0.251', lid=251)
+breaker=server.breaker
+link=server.link
+
+breaker.open(0)
+server.manager()
+assert breaker.isHalfOpen()
+assert len(link._requests)==1
+assert server.nextDeadline() is not None
+
+# NAK of the probe
+(sequence, probe)=list(link._requests.items())[0]
+link.onMessage(2, sequence, b'\x01\x00')
+assert probe.isDone() and not probe.isSuccess()
+assert breaker.isOpen(), breaker
+assert server.nextDeadline()>time.time()
+print('NAKed probe: %s, next probe in %.1fs' % (breaker, server.nextDeadline()-time.time()))
+
+# answered probe
+breaker._timeout=0
+server.manager()
+(sequence, probe)=list(link._requests.items())[0]
+link.onMessage(2, sequence, b'\x00\x00')
+assert breaker.isClosed(), breaker
+print('ACKed probe: %s' % breaker)
+
+node.stop()
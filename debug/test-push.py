@@ -0,0 +1,29 @@
+# Check the last-write-wins of pending pushes (writing back the current value while a push is pending)
+from digimat.saia import SAIANode
+
+node=SAIANode(253, port=15099, autostart=False)
+node.isIpAddressLocal=lambda ip: False
+server=node.servers.declare('192.168.0.251', lid=251)
+memory=server.memory
+
+r=server.registers[10]
+r.setValue(100)
+r.value=200
+r.value=100
+pushes=memory.drainPendingPushes()
+assert pushes[server.registers][10][1]==100, pushes
+r.value=100
+assert not memory.drainPendingPushes()
+print('last write wins: ok')
+
+# stale queue entries don't delay the valid pushes queued behind them
+items=server.registers.declareRange(100, 40)
+for item in items:
+    item.value=1
+    item.clearPush()
+items[-1].value=2
+pushes=memory.drainPendingPushes()
+assert list(pushes[server.registers].keys())==[139], pushes
+print('stale entries skipped: ok')
+
+node.stop()
@@ -0,0 +1,40 @@
+# Check the raw range reads of the local node, and the detach of the out buffer on timeout
+import time
+from array import array
+
+from digimat.saia import SAIANode
+from digimat.saia.transfer import SAIARangeRead
+
+node=SAIANode(253, port=15099, autostart=False)
+local=node.server
+
+for n in range(10, 20):
+    node.registers[n].value=n*100
+node.memory.timers[5].value=1000
+node.flags[3].value=True
+
+values=local.readRange('R', 8, 16)
+assert isinstance(values, array) and list(values[0:4])==[0, 0, 1000, 1100], values
+assert [(index, list(v)) for (index, v) in local.iterRange('R', 10, 2)]==[(10, [1000, 1100])]
+values=local.readRange('T', 4, 3)
+assert values[0]==0 and 900<values[1]<=1000 and values[2]==0, values
+assert list(local.readRange('F', 0, 5))==[0, 0, 0, 1, 0]
+print('local ranges: ok')
+
+# remote range read timeout : late responses don't write into the out buffer anymore
+node.isIpAddressLocal=lambda ip: False
+node.sendMessageToHost=lambda data, host, port=None: True
+server=node.servers.declare('192.168.0.251', lid=251)
+server.link._alive=True
+out=array('I', [7])*64
+reader=SAIARangeRead(server.registers, 0, 64, out)
+reader.initiate()
+server.manager()
+assert reader._requests and any([request.sequence in server.link._requests for request in reader._requests])
+assert not reader.wait(0.1)
+for request in reader._requests:
+    request.processResponse(b'\x00\x00\x00\x01'*request.count)
+assert list(out)==[7]*64
+print('detached on timeout: ok')
+
+node.stop()
@@ -0,0 +1,181 @@
+from __future__ import division
+
+try:
+    # optional, only used for large conversions
+    import numpy
+except ImportError:
+    numpy=None
+
+# minimum booleans count for which numpy (if available) is used
+NUMPY_THRESHOLD = 1024
+
+
+def packbools(values):
+    """
+    Pack a list of booleans into bytes (8 booleans per byte, first boolean in the
+    least significant bit, last byte padded with False).
+    E.g. [True, True, True, True, False, True, False, False] --> b'\\x2f'
+    """
+    count=len(values)
+    if numpy is not None and count>=NUMPY_THRESHOLD:
+        return numpy.packbits(numpy.asarray(values, dtype=bool), bitorder='little').tobytes()
+    if count==0:
+        return b''
+    bits=int(''.join(['1' if value else '0' for value in reversed(values)]), 2)
+    return bits.to_bytes((count+7)//8, 'little')
+
+
+def unpackbools(data, count=None):
+    """
+    Unpack bytes into a list of booleans (reverse of packbools)
+    """
+    if count is None:
+        count=len(data)*8
+    if numpy is not None and count>=NUMPY_THRESHOLD:
+        bits=numpy.unpackbits(numpy.frombuffer(bytes(data), dtype=numpy.uint8), bitorder='little')
+        return bits[:count].astype(bool).tolist()
+    bits=bin2bits(data)
+    return [c=='1' for c in reversed(format(bits, '0%db' % max(count, 1))[-count:])] if count>0 else []
+
+
+# 0/1 bytes of the 8 booleans packed in a byte
+BOOLBYTES = [bytes([(byte >> n) & 1 for n in range(8)]) for byte in range(256)]
+
+
+def unpackboolbytes(data, count):
+    """
+    Unpack bytes into count 0/1 bytes (bytes version of unpackbools)
+    """
+    return b''.join([BOOLBYTES[byte] for byte in bytes(data[:(count+7)//8])])[:count]
+
+
+def bin2bits(data):
+    """
+    return the packed booleans as an int (boolean n is bit n)
+    """
+    return int.from_bytes(bytes(data), 'little')
+
+
+def bits2bin(bits, count):
+    """
+    return the count first booleans of the int bits as packed bytes
+    """
+    return (bits & ((1 << count)-1)).to_bytes((count+7)//8, 'little')
+
+
+class SAIABitSet(object):
+    """
+    Index addressed bitset backed by a bytearray (bit n is bit n&7 of byte n>>3), growing as needed,
+    or by a given fixed size buffer. Bits beyond the bitset size (or the buffer) are read as 0 and
+    never written.
+    Ranges are moved in and out as ints (int.from_bytes/to_bytes and bit operations), without per bit
+    python objects.
+    """
+
+    def __init__(self, size=65536, buffer=None):
+        self._size=size
+        if buffer is not None:
+            # fixed size (e.g. memory mapped) storage, never grown
+            self._data=memoryview(buffer)[:(size+7)//8]
+            self._fixed=True
+            self._capacity=min(size, len(self._data)*8)
+        else:
+            self._data=bytearray()
+            self._fixed=False
+            self._capacity=size
+
+    @property
+    def data(self):
+        return self._data
+
+    def size(self):
+        return self._size
+
+    def capacity(self):
+        """
+        return the count of bits that can be stored (bounded by a fixed size buffer)
+        """
+        return self._capacity
+
+    def grow(self, nbytes):
+        """
+        allocate (at least) the first nbytes, bounded by the bitset size. A fixed size buffer
+        is never grown
+        """
+        if nbytes>len(self._data) and not self._fixed:
+            nbytes=min(max(nbytes, 2*len(self._data), 32), (self._size+7)//8)
+            self._data.extend(bytes(nbytes-len(self._data)))
+
+    def get(self, index):
+        try:
+            if self._data[index >> 3] & (1 << (index & 7)):
+                return True
+        except IndexError:
+            pass
+        return False
+
+    def set(self, index, value=True):
+        if index<0 or index>=self._capacity:
+            return
+        byte=index >> 3
+        if byte>=len(self._data):
+            if not value:
+                return
+            self.grow(byte+1)
+        if value:
+            self._data[byte]|=(1 << (index & 7))
+        else:
+            self._data[byte]&=~(1 << (index & 7))
+
+    def getRange(self, index, count):
+        """
+        return the count bits starting at index as an int
+        """
+        if count<=0:
+            return 0
+        chunk=self._data[index >> 3:(index+count+7) >> 3]
+        return (int.from_bytes(chunk, 'little') >> (index & 7)) & ((1 << count)-1)
+
+    def setRange(self, index, count, bits, mask=None):
+        """
+        set the count bits starting at index from the given int. If given, only
+        the bits set in mask are changed
+        """
+        # bits beyond the capacity are dropped
+        count=min(count, self._capacity-index)
+        if count<=0 or index<0:
+            return
+        b0=index >> 3
+        b1=(index+count+7) >> 3
+        self.grow(b1)
+        shift=index & 7
+        if mask is None:
+            mask=(1 << count)-1
+        else:
+            mask&=(1 << count)-1
+        mask<<=shift
+        chunk=int.from_bytes(self._data[b0:b1], 'little')
+        chunk=(chunk & ~mask) | ((bits << shift) & mask)
+        self._data[b0:b1]=chunk.to_bytes(b1-b0, 'little')
+
+    def getBytes(self, index, count):
+        """
+        return the count bits starting at index as packed bytes
+        """
+        return bits2bin(self.getRange(index, count), count)
+
+    def setBytes(self, index, count, data):
+        self.setRange(index, count, bin2bits(data))
+
+    def count(self):
+        """
+        return the number of bits set
+        """
+        return bin(int.from_bytes(self._data, 'little')).count('1')
+
+    def __repr__(self):
+        return '<%s(size=%d, allocated=%d bytes)>' % (self.__class__.__name__, self._size, len(self._data))
+
+
+if __name__ == "__main__":
+    pass
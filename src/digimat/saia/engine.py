@@ -0,0 +1,288 @@
+from __future__ import division
+
+import time
+import heapq
+import asyncio
+
+from threading import Thread
+from threading import Lock
+from threading import current_thread
+
+
+class SAIANodeProtocol(asyncio.DatagramProtocol):
+    """
+    UDP endpoint of an asyncio driven node. Every received datagram is immediately
+    dispatched to the node (no more socket polling)
+    """
+
+    def __init__(self, engine):
+        self._engine=engine
+
+    @property
+    def logger(self):
+        return self._engine.logger
+
+    def datagram_received(self, data, address):
+        self._engine.onDatagram(data, address)
+
+    def error_received(self, exc):
+        self.logger.error('udp:%s' % exc)
+
+    def connection_lost(self, exc):
+        self._engine.onConnectionLost(exc)
+
+
+class SAIANodeEngine(object):
+    """
+    asyncio based node manager, replacing the digimat.jobs polling thread.
+
+    The node manager is only invoked when something has to be done : a datagram has
+    been received, an item/transfer has been queued (wakeup) or a registered deadline
+    (request timeout, item refresh, ...) has been reached (wakeupAt). The engine runs
+    its own event loop in a background thread, or can be attached to an existing
+    (running) loop given by the application.
+    """
+
+    # deadline resolution (s), allowing to merge close deadlines in a single timer
+    DEADLINE_RESOLUTION = 0.01
+
+    def __init__(self, node, loop=None, delayIdle=1.0):
+        assert node.__class__.__name__=='SAIANode'
+        self._node=node
+        self._loop=loop
+        self._ownLoop=(loop is None)
+        self._thread=None
+        self._transport=None
+        self._delayIdle=delayIdle
+        self._lock=Lock()
+        self._deadlines=[]
+        self._deadlinesSlots=set()
+        self._timer=None
+        self._timerSlot=None
+        self._wakeupPending=False
+        self._running=False
+        self._stop=False
+        self._tickCount=0
+
+    @property
+    def node(self):
+        return self._node
+
+    @property
+    def logger(self):
+        return self.node.logger
+
+    @property
+    def loop(self):
+        return self._loop
+
+    def isRunning(self):
+        if self._running and not self._stop:
+            return True
+        return False
+
+    def isOpen(self):
+        if self._transport is not None:
+            return True
+        return False
+
+    def setIdleDelay(self, delay):
+        self._delayIdle=max(0.01, float(delay))
+
+    def start(self):
+        if self._running:
+            return
+
+        self._running=True
+        self._stop=False
+        if self._ownLoop:
+            self._loop=asyncio.new_event_loop()
+            self._thread=Thread(target=self.run, name='SAIANodeEngine')
+            self._thread.daemon=True
+            self._thread.start()
+        else:
+            asyncio.run_coroutine_threadsafe(self.open(), self._loop)
+
+    def run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.create_task(self.open())
+            self._loop.run_forever()
+        except:
+            self.logger.exception('engine:run()')
+        finally:
+            self.shutdown()
+            try:
+                self._loop.close()
+            except:
+                pass
+            self._running=False
+
+    async def open(self):
+        while not self._stop:
+            try:
+                sock=self.node.open()
+                if sock:
+                    (transport, protocol)=await self._loop.create_datagram_endpoint(
+                        lambda: SAIANodeProtocol(self), sock=sock)
+                    self._transport=transport
+                    self.logger.info('asyncio engine started')
+                    self.wakeup()
+                    return True
+            except:
+                self.logger.exception('engine:open()')
+                self.node.close()
+            await asyncio.sleep(1.0)
+
+    def shutdown(self):
+        try:
+            if self._timer:
+                self._timer.cancel()
+        except:
+            pass
+        self._timer=None
+
+        try:
+            if self._transport:
+                self._transport.close()
+        except:
+            pass
+        self._transport=None
+        self.node._socket=None
+
+    def stop(self):
+        if not self._running:
+            return
+
+        self._stop=True
+
+        def halt():
+            self.shutdown()
+            if self._ownLoop:
+                self._loop.stop()
+            else:
+                self._running=False
+
+        try:
+            self._loop.call_soon_threadsafe(halt)
+        except:
+            pass
+
+        if self._thread and self._thread is not current_thread():
+            self._thread.join(5.0)
+
+    def sendto(self, data, address):
+        if self._transport:
+            self._transport.sendto(data, address)
+            return len(data)
+        return 0
+
+    def onDatagram(self, data, address):
+        self.node.processMessage(data, address)
+        # response processing may have released a link
+        self.wakeup()
+
+    def onConnectionLost(self, exc):
+        self._transport=None
+        self.node._socket=None
+        if not self._stop:
+            self.logger.error('engine:connection lost (%s)' % exc)
+            self._loop.create_task(self.open())
+
+    def wakeup(self):
+        """
+        Request a node manager pass as soon as possible (thread safe)
+        """
+        if not self._wakeupPending and self._running:
+            self._wakeupPending=True
+            try:
+                self._loop.call_soon_threadsafe(self.tick)
+            except:
+                self._wakeupPending=False
+
+    def wakeupAt(self, stamp):
+        """
+        Request a node manager pass at the given time.time() stamp (thread safe)
+        """
+        slot=int(stamp/self.DEADLINE_RESOLUTION)+1
+        with self._lock:
+            if slot in self._deadlinesSlots:
+                return
+            self._deadlinesSlots.add(slot)
+            heapq.heappush(self._deadlines, slot)
+            if self._timerSlot is None or slot>=self._timerSlot:
+                return
+
+        try:
+            self._loop.call_soon_threadsafe(self.schedule)
+        except:
+            pass
+
+    def nextDeadline(self):
+        now=time.time()
+        deadline=now+self._delayIdle
+        with self._lock:
+            if self._deadlines:
+                stamp=self._deadlines[0]*self.DEADLINE_RESOLUTION
+                # a passed deadline is due right now (tick will consume it)
+                deadline=max(now, min(deadline, stamp))
+        return deadline
+
+    def consumeDeadlines(self):
+        """
+        drop the reached deadlines (a manager pass is being done)
+        """
+        now=time.time()
+        with self._lock:
+            while self._deadlines:
+                slot=self._deadlines[0]
+                if slot*self.DEADLINE_RESOLUTION>now:
+                    break
+                heapq.heappop(self._deadlines)
+                self._deadlinesSlots.discard(slot)
+
+    def schedule(self):
+        if self._stop or not self._transport:
+            return
+
+        deadline=self.nextDeadline()
+        slot=int(round(deadline/self.DEADLINE_RESOLUTION))
+        if self._timer:
+            if slot==self._timerSlot:
+                return
+            self._timer.cancel()
+
+        self._timerSlot=slot
+        delay=max(0, deadline-time.time())
+        self._timer=self._loop.call_at(self._loop.time()+delay, self.onTimer)
+
+    def onTimer(self):
+        self._timer=None
+        self._timerSlot=None
+        self.tick()
+
+    def tick(self):
+        self._wakeupPending=False
+        if self._stop or not self._transport:
+            return
+
+        self._tickCount+=1
+        self.consumeDeadlines()
+        activity=False
+        try:
+            activity=self.node.process()
+        except:
+            self.logger.exception('engine:tick()')
+
+        if activity:
+            self.wakeup()
+        else:
+            self.schedule()
+
+    def __repr__(self):
+        return '<%s(running=%d, ticks=%d, deadlines=%d)>' % (self.__class__.__name__,
+            self.isRunning(), self._tickCount, len(self._deadlines))
+
+
+if __name__ == "__main__":
+    pass
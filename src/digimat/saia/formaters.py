@@ -1,4 +1,11 @@
 import struct
+import math
+
+try:
+    # optional, used by the array conversions
+    import numpy
+except ImportError:
+    numpy=None
 
 from .singleton import Singleton
 
@@ -16,6 +23,40 @@ class SAIAValueFormater(Singleton):
         """
         return userValue
 
+    def decodeMany(self, deviceValues):
+        """
+        decode a sequence of UINT32 device values, returning a numpy array (if numpy
+        is available) or a list. Subclasses convert the whole sequence at once
+        """
+        values=[self.decode(value) for value in deviceValues]
+        if numpy is not None:
+            return numpy.array(values)
+        return values
+
+    def encodeMany(self, userValues):
+        """
+        encode a sequence of user values to UINT32 device values (numpy array or list)
+        """
+        values=[self.encode(value) for value in userValues]
+        if numpy is not None:
+            return numpy.array(values, dtype=numpy.uint32)
+        return values
+
+    def uint32array(self, deviceValues):
+        return numpy.asarray(deviceValues, dtype=numpy.int64).astype(numpy.uint32)
+
+    def float32array(self, userValues):
+        """
+        convert user values to a float32 numpy array. As struct.pack('f'), finite values
+        out of the float32 range raise OverflowError (instead of a numpy warning and inf)
+        """
+        values=numpy.asarray(userValues, dtype=numpy.float64)
+        with numpy.errstate(over='ignore'):
+            floats=values.astype(numpy.float32)
+        if numpy.any(numpy.isinf(floats) & numpy.isfinite(values)):
+            raise OverflowError('float too large to pack with f format')
+        return floats
+
 
 class SAIAValueFormaterFloat32(SAIAValueFormater):
     def decode(self, deviceValue):
@@ -24,6 +65,18 @@ class SAIAValueFormaterFloat32(SAIAValueFormater):
     def encode(self, userValue):
         return struct.unpack('>I', struct.pack('>f', userValue))[0]
 
+    def decodeMany(self, deviceValues):
+        if numpy is not None:
+            return self.uint32array(deviceValues).view(numpy.float32).astype(numpy.float64)
+        count=len(deviceValues)
+        return list(struct.unpack('>%df' % count, struct.pack('>%dI' % count, *deviceValues)))
+
+    def encodeMany(self, userValues):
+        if numpy is not None:
+            return self.float32array(userValues).view(numpy.uint32)
+        count=len(userValues)
+        return list(struct.unpack('>%dI' % count, struct.pack('>%df' % count, *userValues)))
+
 
 class SAIAValueFormaterSwappedFloat32(SAIAValueFormater):
     def decode(self, deviceValue):
@@ -32,6 +85,18 @@ class SAIAValueFormaterSwappedFloat32(SAIAValueFormater):
     def encode(self, userValue):
         return struct.unpack('>I', struct.pack('<f', userValue))[0]
 
+    def decodeMany(self, deviceValues):
+        if numpy is not None:
+            return self.uint32array(deviceValues).byteswap().view(numpy.float32).astype(numpy.float64)
+        count=len(deviceValues)
+        return list(struct.unpack('<%df' % count, struct.pack('>%dI' % count, *deviceValues)))
+
+    def encodeMany(self, userValues):
+        if numpy is not None:
+            return self.float32array(userValues).view(numpy.uint32).byteswap()
+        count=len(userValues)
+        return list(struct.unpack('>%dI' % count, struct.pack('<%df' % count, *userValues)))
+
 
 class SAIAValueFormaterInteger10(SAIAValueFormater):
     def decode(self, deviceValue):
@@ -39,9 +104,32 @@ class SAIAValueFormaterInteger10(SAIAValueFormater):
         return round(float(deviceValue/10.0), 1)
 
     def encode(self, userValue):
-        userValue=int(round(float(userValue)*10.0, 1))
+        userValue=float(userValue)
+        if not math.isfinite(userValue):
+            raise ValueError('non finite value %s' % userValue)
+        userValue=int(round(userValue*10.0, 1))
+        if userValue<-0x80000000 or userValue>0x7fffffff:
+            raise ValueError('value out of the int32 range')
         return struct.unpack('>I', struct.pack('>i', userValue))[0]
 
+    def decodeMany(self, deviceValues):
+        if numpy is not None:
+            return numpy.round(self.uint32array(deviceValues).view(numpy.int32)/10.0, 1)
+        count=len(deviceValues)
+        return [round(value/10.0, 1) for value in struct.unpack('>%di' % count, struct.pack('>%dI' % count, *deviceValues))]
+
+    def encodeMany(self, userValues):
+        if numpy is not None:
+            values=numpy.asarray(userValues, dtype=numpy.float64)
+            # checked before the int32 cast, which is undefined (and warns) for these values
+            if not numpy.all(numpy.isfinite(values)):
+                raise ValueError('non finite value')
+            values=numpy.trunc(numpy.round(values*10.0, 1))
+            if numpy.any((values<-0x80000000) | (values>0x7fffffff)):
+                raise ValueError('value out of the int32 range')
+            return values.astype(numpy.int32).view(numpy.uint32)
+        return [self.encode(value) for value in userValues]
+
 
 class SAIAValueFormaterFFP(SAIAValueFormater):
     """
@@ -90,7 +178,12 @@ class SAIAValueFormaterFFP(SAIAValueFormater):
         if userValue==0.0:
             return 0
 
-        value=struct.unpack('>I', struct.pack('>f', float(userValue)))[0]
+        # FFP has no NaN/infinity encoding
+        userValue=float(userValue)
+        if not math.isfinite(userValue):
+            raise ValueError('non finite value %s' % userValue)
+
+        value=struct.unpack('>I', struct.pack('>f', userValue))[0]
         s=value & 0x80000000
         # e=88-(24-(((value & 0x7f800000) >> 23)-127+1))
         e=((value & 0x7f800000) >> 23)-62
@@ -102,6 +195,39 @@ class SAIAValueFormaterFFP(SAIAValueFormater):
         deviceValue=m
         return deviceValue
 
+    def decodeMany(self, deviceValues):
+        if numpy is not None:
+            values=self.uint32array(deviceValues)
+            m=(values & 0x7fffff00) >> 8
+            m|=((values & 0x7f)+62) << 23
+            m|=(values & 0x80).astype(numpy.uint32) << 24
+            m[(values & 0xffffff00)==0]=0
+            return m.view(numpy.float32).astype(numpy.float64)
+        ieee=[]
+        for value in deviceValues:
+            if (value & 0xffffff00)==0:
+                ieee.append(0)
+            else:
+                m=((value & 0x7fffff00) >> 8) | (((value & 0x7f)+62) << 23)
+                if value & 0x80:
+                    m|=0x80000000
+                ieee.append(m)
+        count=len(ieee)
+        return list(struct.unpack('>%df' % count, struct.pack('>%dI' % count, *ieee)))
+
+    def encodeMany(self, userValues):
+        if numpy is not None:
+            floats=self.float32array(userValues)
+            if not numpy.all(numpy.isfinite(floats)):
+                raise ValueError('non finite value')
+            values=floats.view(numpy.uint32).astype(numpy.int64)
+            m=((values & 0x7fffff) | 0x800000) << 8
+            m|=((values & 0x7f800000) >> 23)-62
+            m|=(values & 0x80000000) >> 24
+            m[floats==0.0]=0
+            return (m & 0xffffffff).astype(numpy.uint32)
+        return [self.encode(value) for value in userValues]
+
 
 if __name__ == "__main__":
     pass
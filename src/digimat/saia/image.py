@@ -0,0 +1,140 @@
+from __future__ import division
+
+import struct
+
+# big-endian UINT32 (analog values in frames)
+UINT32BE = struct.Struct('>L')
+
+
+class SAIAPagedImage(object):
+    """
+    Sparse index addressed image of big-endian UINT32 values, split into pages of PAGE_SIZE
+    values allocated on the first (non zero) write. Reading an address of a not allocated
+    page returns 0 without allocating anything. The count of pages can be capped (maxPages),
+    writes requiring a new page beyond the cap being refused.
+    The image can be backed by a given contiguous buffer (e.g. memory mapped), pages being
+    then views on this buffer. The pages holding values are found when the image is created.
+    """
+
+    PAGE_SIZE = 256
+
+    def __init__(self, size=65536, maxPages=None, buffer=None):
+        self._size=size
+        self._maxPages=maxPages
+        self._pages={}
+        self._refused=0
+        self._buffer=None
+        if buffer is not None:
+            self._buffer=memoryview(buffer)
+            empty=bytes(self.PAGE_SIZE*4)
+            for n in range(len(self._buffer)//len(empty)):
+                page=self.bufferPage(n)
+                if page!=empty:
+                    self._pages[n]=page
+
+    def bufferPage(self, n):
+        return self._buffer[n*self.PAGE_SIZE*4:(n+1)*self.PAGE_SIZE*4]
+
+    def setMaxPages(self, maxPages=None):
+        self._maxPages=maxPages
+
+    def getMaxPages(self):
+        return self._maxPages
+
+    def countPages(self):
+        return len(self._pages)
+
+    def canAllocate(self, index):
+        """
+        return True if a value can be written at the given index (page allocated or allocatable)
+        """
+        if index>=self._size:
+            return False
+        if self._maxPages is None or (index >> 8) in self._pages:
+            return True
+        return len(self._pages)<self._maxPages
+
+    def canAllocateRange(self, index, count):
+        """
+        return True if the pages of the count values starting at index are allocated or allocatable
+        """
+        if index+count>self._size:
+            return False
+        if self._maxPages is None:
+            return True
+        missing=0
+        for n in range(index >> 8, ((index+count-1) >> 8)+1):
+            if n not in self._pages:
+                missing+=1
+        return len(self._pages)+missing<=self._maxPages
+
+    def refuse(self):
+        """
+        count a write refused by the caller (i.e. a whole range refused before being written)
+        """
+        self._refused+=1
+
+    def get(self, index):
+        page=self._pages.get(index >> 8)
+        if page is None:
+            return 0
+        return UINT32BE.unpack_from(page, (index & 0xff)*4)[0]
+
+    def set(self, index, data):
+        """
+        write the (4 bytes) big-endian value at the given index. Return False if the page
+        can't be allocated (cap reached)
+        """
+        page=self._pages.get(index >> 8)
+        if page is None:
+            if data==b'\x00\x00\x00\x00':
+                return True
+            if not self.canAllocate(index):
+                self._refused+=1
+                return False
+            if self._buffer is not None:
+                page=self.bufferPage(index >> 8)
+            else:
+                page=bytearray(self.PAGE_SIZE*4)
+            self._pages[index >> 8]=page
+        offset=(index & 0xff)*4
+        page[offset:offset+4]=data
+        return True
+
+    def getBytes(self, index, count):
+        """
+        return the count values starting at index as big-endian UINT32 (frame payload)
+        """
+        offset=index & 0xff
+        if offset+count<=self.PAGE_SIZE:
+            page=self._pages.get(index >> 8)
+            if page is None:
+                return bytes(count*4)
+            return bytes(page[offset*4:(offset+count)*4])
+
+        chunks=[]
+        while count>0:
+            offset=index & 0xff
+            n=min(count, self.PAGE_SIZE-offset)
+            chunks.append(self.getBytes(index, n))
+            index+=n
+            count-=n
+        return b''.join(chunks)
+
+    def stats(self):
+        """
+        return the pages usage as a dict
+        """
+        return {'pages': len(self._pages),
+                'maxPages': self._maxPages,
+                'pageSize': self.PAGE_SIZE,
+                'bytes': len(self._pages)*self.PAGE_SIZE*4,
+                'refused': self._refused}
+
+    def __repr__(self):
+        return '<%s(pages=%d, max=%s, %d bytes)>' % (self.__class__.__name__,
+            len(self._pages), self._maxPages, len(self._pages)*self.PAGE_SIZE*4)
+
+
+if __name__ == "__main__":
+    pass
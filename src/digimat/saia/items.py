@@ -1,10 +1,16 @@
 from __future__ import print_function  # Python 2/3 compatibility
 
 import time
+import heapq
+import asyncio
+import weakref
+from bisect import bisect_left
 from prettytable import PrettyTable
 
 from threading import RLock
-from threading import Event
+from threading import Lock
+from threading import Condition
+from concurrent.futures import Future
 
 from .formaters import SAIAValueFormaterFloat32
 from .formaters import SAIAValueFormaterSwappedFloat32
@@ -12,11 +18,53 @@ from .formaters import SAIAValueFormaterInteger10
 from .formaters import SAIAValueFormaterFFP
 from .formaters import SAIAValueFormater
 
+try:
+    # optional, used by snapshots
+    import numpy
+except ImportError:
+    numpy=None
+
+from .plan import SAIAReadPlan
+from .store import SAIAItemStore
+from .store import SAIABooleanItemStore
+
+# formaters singletons, resolved once for the items accessors
+FORMATER_FLOAT32 = SAIAValueFormaterFloat32()
+FORMATER_SWAPPEDFLOAT32 = SAIAValueFormaterSwappedFloat32()
+FORMATER_INT10 = SAIAValueFormaterInteger10()
+FORMATER_FFP = SAIAValueFormaterFFP()
+
+
+def decodeItemsValues(items, formater=None):
+    """
+    return the decoded values of the given items (same order). Items are batched per formater
+    (the item formater, or the given default formater), each batch being converted at once
+    (formater.decodeMany). Values of items without formater are returned raw
+    """
+    values=[item.getValue() for item in items]
+    batches={}
+    for (n, item) in enumerate(items):
+        itemFormater=getattr(item, '_formater', None) or formater
+        if itemFormater is not None:
+            batches.setdefault(id(itemFormater), (itemFormater, []))[1].append(n)
+
+    for (itemFormater, positions) in batches.values():
+        decoded=itemFormater.decodeMany([values[n] for n in positions])
+        if numpy is not None:
+            decoded=decoded.tolist()
+        for (n, value) in zip(positions, decoded):
+            values[n]=value
+    return values
+
 
 class SAIAItemGroup(object):
     def __init__(self, items=None):
         self._items=[]
         self._itemsIndexById={}
+        self._lock=Lock()
+        self._tracking=False
+        self._dirty=set()
+        self._callbacks=[]
         self.add(items)
 
     @property
@@ -57,8 +105,76 @@ class SAIAItemGroup(object):
 
             self._itemsIndexById[id(item)]=self.count()
             self._items.append(item)
+            if self._tracking:
+                item.subscribe(self.onItemChange)
             return item
 
+    def track(self):
+        """
+        subscribe to the group items changes, keeping the changed items in a dirty set
+        """
+        with self._lock:
+            if self._tracking:
+                return
+            self._tracking=True
+        for item in self.all():
+            item.subscribe(self.onItemChange)
+
+    def untrack(self):
+        """
+        stop the changes tracking, removing the group subscriptions from the items collections
+        (a tracked group is referenced by its items collections until untracked)
+        """
+        with self._lock:
+            if not self._tracking:
+                return
+            self._tracking=False
+            self._dirty=set()
+        for item in self.all():
+            item.unsubscribe(self.onItemChange)
+
+    def close(self):
+        """
+        release the group (changes tracking and onChange callbacks)
+        """
+        with self._lock:
+            self._callbacks=[]
+        self.untrack()
+
+    def onItemChange(self, item):
+        with self._lock:
+            self._dirty.add(item)
+            callbacks=self._callbacks
+        for callback in callbacks:
+            try:
+                callback(item)
+            except:
+                item.logger.exception('onChange(%s)' % callback)
+
+    def onChange(self, callback):
+        """
+        register a callback(item) fired when the value of one of the group items changes
+        """
+        with self._lock:
+            self._callbacks=self._callbacks+[callback]
+        self.track()
+
+    def changed(self, reset=True):
+        """
+        return the items (in group order) whose value changed since the last call. The
+        first call starts the changes tracking (and returns an empty list)
+        """
+        if not self._tracking:
+            self.track()
+            return []
+        with self._lock:
+            items=self._dirty
+            if reset:
+                self._dirty=set()
+            else:
+                items=set(items)
+        return sorted(items, key=lambda item: self._itemsIndexById.get(id(item), 0))
+
     def refresh(self, urgent=False):
         if self._items:
             for item in self.all():
@@ -67,13 +183,39 @@ class SAIAItemGroup(object):
 
     def read(self, timeout=15.0):
         if self._items:
-            timeout=time.time()+timeout
-            self.refresh(True)
-            for item in self.all():
-                t=timeout-time.time()
-                if t<0 or not item.waitUpdated(t):
-                    return False
-            return True
+            return self.gather(timeout).isSuccess()
+
+    def gather(self, timeout=15.0):
+        """
+        Concurrent group read : the group items are read with the minimal count of range frames
+        per server collection, issued on every server at once. Wait for the frames completion
+        (overall timeout) and return the SAIAGroupRead result, reporting the success per item
+        """
+        reader=SAIAGroupRead(self.all())
+        reader.initiate()
+        reader.wait(timeout)
+        return reader
+
+    async def aread(self, timeout=15.0):
+        """
+        coroutine version of read(), waiting for every item's refresh at once
+        """
+        if self._items:
+            reader=SAIAGroupRead(self.all())
+            reader.initiate()
+            try:
+                if timeout is not None and timeout<=0:
+                    timeout=None
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(reader.future)), timeout)
+            except asyncio.TimeoutError:
+                reader.cancel()
+            return reader.isSuccess()
+
+    def decodedValues(self, formater=None):
+        """
+        return the group items decoded values (group order), converted per formater at once
+        """
+        return decodeItemsValues(self.all(), formater)
 
     def isRaised(self, reset=True):
         if self._items:
@@ -84,11 +226,25 @@ class SAIAItemGroup(object):
 
     def isChanged(self, reset=True):
         if self._items:
+            if self._tracking:
+                # only the items of the dirty set have to be checked
+                for item in self.changed(False):
+                    if item.isChanged(reset):
+                        if reset:
+                            self.discardChanged(item)
+                        return item
+                    self.discardChanged(item)
+                return False
+
             for item in self.all():
                 if item.isChanged(reset):
                     return item
         return False
 
+    def discardChanged(self, item):
+        with self._lock:
+            self._dirty.discard(item)
+
     def isUpdated(self, reset=True):
         if self._items:
             for item in self.all():
@@ -135,24 +291,152 @@ class SAIAItemGroup(object):
         return '<%s(%d items)>' % (self.__class__.__name__, self.count())
 
 
+class SAIAGroupRead(object):
+    """
+    Scatter/gather read of a set of items. Items are merged per collection into frame sized
+    ranges (greedy, holes allowed), the corresponding read requests being queued at once on
+    every server. A single future is resolved when every frame is terminated
+    """
+
+    def __init__(self, items):
+        self._items=list(items)
+        self._results={}
+        self._requests=[]
+        self._pending=0
+        self._lock=Lock()
+        self._future=Future()
+
+    @property
+    def future(self):
+        return self._future
+
+    def plan(self):
+        """
+        return the frames to read as a list of (collection, first item, count, covered items)
+        """
+        collections={}
+        for item in self._items:
+            collections.setdefault(id(item.parent), (item.parent, []))[1].append(item)
+
+        frames=[]
+        for (collection, items) in collections.values():
+            items.sort(key=lambda item: item.index)
+            maxcount=collection.FRAME_MAXCOUNT
+            n=0
+            while n<len(items):
+                first=items[n]
+                covered=[]
+                while n<len(items) and items[n].index<first.index+maxcount:
+                    covered.append(items[n])
+                    n+=1
+                frames.append((collection, first, covered[-1].index-first.index+1, covered))
+        return frames
+
+    def initiate(self):
+        for item in self._items:
+            self._results[item]=False
+
+        requests=[]
+        for (collection, first, count, covered) in self.plan():
+            if collection.isLocalNodeMode():
+                for item in covered:
+                    self._results[item]=True
+                continue
+            request=collection.createReadRequest()
+            if request is not None:
+                request.setupRange(first, count)
+                request.addDoneCallback(lambda request, success, covered=covered: self.onFrameDone(covered, success))
+                requests.append((collection, request))
+
+        with self._lock:
+            self._requests=[request for (collection, request) in requests]
+            self._pending=len(requests)
+        if not requests:
+            self._future.set_result(self.isSuccess())
+        for (collection, request) in requests:
+            collection.memory.submitRead(request)
+
+    def onFrameDone(self, items, success):
+        with self._lock:
+            if success:
+                for item in items:
+                    self._results[item]=True
+            self._pending-=1
+            done=(self._pending==0)
+        if done and not self._future.done():
+            self._future.set_result(self.isSuccess())
+
+    def wait(self, timeout=15.0):
+        """
+        wait for the frames completion, cancelling the not yet initiated frames on timeout
+        """
+        try:
+            if timeout is not None and timeout<=0:
+                timeout=None
+            self._future.result(timeout)
+        except:
+            self.cancel()
+        return self.isSuccess()
+
+    def cancel(self):
+        for request in self._requests:
+            request.cancel()
+
+    def isDone(self):
+        return self._future.done()
+
+    def isSuccess(self):
+        if self._items and all(self._results.values()):
+            return True
+        return False
+
+    @property
+    def results(self):
+        """
+        return the {item: success} read results
+        """
+        return dict(self._results)
+
+    def succeeded(self):
+        return [item for item in self._items if self._results.get(item)]
+
+    def failed(self):
+        return [item for item in self._items if not self._results.get(item)]
+
+    def decodedValues(self, formater=None):
+        """
+        return the decoded values of the read items (None for the failed ones)
+        """
+        items=self.succeeded()
+        values=dict(zip(map(id, items), decodeItemsValues(items, formater)))
+        return [values.get(id(item)) for item in self._items]
+
+    def countFrames(self):
+        return len(self._requests)
+
+    def __repr__(self):
+        return '<%s(%d items, %d frames, %d failed)>' % (self.__class__.__name__,
+            len(self._items), len(self._requests), len(self.failed()))
+
+
 class SAIAItem(object):
-    def __init__(self, parent, index, value=0, delayRefresh=None, readOnly=False):
+    """
+    Item of an items collection. The item state (value, stamp, flags) lives in the collection's
+    columnar store (SAIAItemStore) : an item object is only a lightweight proxy, created on
+    access. Items carrying a specific state (refresh delay, formater, pending futures) are
+    kept (pinned) by the collection. Threads waiting for an item state (flag) are waiting on the
+    collection condition.
+    """
+
+    __slots__=('_parent', '_index', '_slot', '_delayRefresh', '_futuresValue', '_futuresPush', '__weakref__')
+
+    def __init__(self, parent, index, slot):
         self._parent=parent
         self._index=index
-        self._value=self.validateValue(value)
-        self._pushValue=None
-        self._stamp=0
-        self._inhibitTimeout=0
-        self._readOnly=readOnly
-        self._delayRefresh=delayRefresh
-        self._eventPush=Event()
-        self._eventPull=Event()
-        self._eventValue=Event()
-        self._eventRaised=Event()
-        self._eventChanged=Event()
-        self._eventUpdated=Event()
-        self.onInit()
-        self.logger.debug('%s->creating %s' % (self.server.host, self))
+        self._slot=slot
+        self._delayRefresh=None
+        self._futuresValue=None
+        self._futuresPush=None
 
     @property
     def parent(self):
@@ -170,6 +454,10 @@ class SAIAItem(object):
     def memory(self):
         return self.server.memory
 
+    @property
+    def store(self):
+        return self._parent._store
+
     @property
     def index(self):
         return self._index
@@ -203,10 +491,30 @@ class SAIAItem(object):
         return False
 
     def onInit(self):
+        """
+        called once, when the item is declared
+        """
         pass
 
+    def isSpecific(self):
+        """
+        True if the item carries a state that isn't kept in the collection store
+        """
+        if self._delayRefresh is not None or self._futuresValue or self._futuresPush:
+            return True
+        return False
+
+    def updatePin(self):
+        if self.isSpecific():
+            self._parent.pin(self)
+        else:
+            self._parent.unpin(self)
+
     def setRefreshDelay(self, delay):
         self._delayRefresh=delay
+        self.updatePin()
+        self._parent.schedule(self, self.store.getStamp(self._slot)+self.getRefreshDelay())
+        self.server.signalReady()
 
     def getRefreshDelay(self):
         try:
@@ -220,65 +528,128 @@ class SAIAItem(object):
         return value
 
     def setReadOnly(self, state=True):
-        self._readOnly=state
+        with self._parent._lock:
+            if state:
+                self.store.setFlag(self._slot, SAIAItemStore.FLAG_READONLY)
+            else:
+                self.store.clearFlag(self._slot, SAIAItemStore.FLAG_READONLY)
 
     def isReadOnly(self):
-        if self._readOnly or self.parent.isReadOnly():
+        if self.store.isFlag(self._slot, SAIAItemStore.FLAG_READONLY) or self.parent.isReadOnly():
             return True
         return False
 
+    def isFlag(self, flag):
+        return self.store.isFlag(self._slot, flag)
+
+    def setFlags(self, flags):
+        # must be called with the collection lock held
+        self.store.setFlag(self._slot, flags)
+        self._parent.notify()
+
+    def clearFlag(self, flag):
+        with self._parent._lock:
+            self.store.clearFlag(self._slot, flag)
+
+    def testAndClearFlag(self, flag, reset=True):
+        with self._parent._lock:
+            if self.store.isFlag(self._slot, flag):
+                if reset:
+                    self.store.clearFlag(self._slot, flag)
+                return True
+        return False
+
+    def waitFlag(self, flag, timeout=None):
+        store=self.store
+        slot=self._slot
+        parent=self._parent
+        with parent._condition:
+            if store.isFlag(slot, flag):
+                return True
+            parent._waiters+=1
+            try:
+                return parent._condition.wait_for(lambda: store.isFlag(slot, flag), timeout)
+            finally:
+                parent._waiters-=1
+
     def signalPush(self, value):
         if self.parent.isLocalNodeMode():
             self.setValue(value)
         else:
-            if not self._eventPush.isSet():
-                self._eventPush.set()
-                self._parent.signalPush(self)
             with self._parent._lock:
-                self._pushValue=value
+                self.store.setPushValue(self._slot, value)
+                queued=self.store.testAndSetFlag(self._slot, SAIAItemStore.FLAG_PUSH)
+            if not queued:
+                self._parent.signalPush(self)
 
     def isPendingPushRequest(self):
-        if self._eventPush.isSet():
-            return True
-        return False
+        return self.isFlag(SAIAItemStore.FLAG_PUSH)
 
     def clearPush(self):
-        self._eventPush.clear()
+        self.clearFlag(SAIAItemStore.FLAG_PUSH)
 
     def signalPull(self, urgent=False):
         if not self.parent.isLocalNodeMode():
-            if not self._eventPull.isSet():
-                self._eventPull.set()
-                self._eventValue.clear()
+            with self._parent._lock:
+                queued=self.store.testAndSetFlag(self._slot, SAIAItemStore.FLAG_PULL)
+                if not queued or urgent:
+                    self.clearFlag(SAIAItemStore.FLAG_VALUE)
+            if urgent and self.isPendingPushRequest():
+                # the pending write must be sent before the read
+                self.memory.flushWrites()
+            if not queued:
                 self._parent.signalPull(self, urgent)
 
     def clearPull(self):
-        self._eventPull.clear()
+        self.clearFlag(SAIAItemStore.FLAG_PULL)
 
     def isPendingPullRequest(self):
-        if self._eventPull.isSet():
-            return True
-        return False
+        return self.isFlag(SAIAItemStore.FLAG_PULL)
 
     def setValue(self, value, force=False):
         # we must be able to setValue from a readItemResponse
         if value is not None and (force or not self.isReadOnly()):
             value=self.validateValue(value)
+            store=self.store
+            slot=self._slot
+            flags=SAIAItemStore.FLAG_VALUE | SAIAItemStore.FLAG_UPDATED
             with self._parent._lock:
                 # only if we have already received a value
-                if self._stamp>0 or self.server.isLocalNodeMode():
-                    if not self._value and value:
-                        self._eventRaised.set()
-                    if value!=self._value:
-                        self._eventChanged.set()
-                self._stamp=time.time()
-                self._value=value
-            self._eventValue.set()
-            self._eventUpdated.set()
+                current=store.getValue(slot)
+                if store.getStamp(slot)>0 or self._parent.isLocalNodeMode():
+                    if not current and value:
+                        flags |= SAIAItemStore.FLAG_RAISED
+                    if value!=current and self.isSignificantChange(value, current):
+                        flags |= SAIAItemStore.FLAG_CHANGED
+                if value!=current:
+                    self.clearDecodedValue()
+                stamp=time.time()
+                store.setStamp(slot, stamp)
+                store.setValue(slot, value)
+                self.setFlags(flags)
+            if self._futuresValue:
+                self.resolveFutures(value)
+            if flags & SAIAItemStore.FLAG_CHANGED and self._parent._subscribed:
+                self._parent.notifyChange(self)
+            # next refresh deadline
+            self._parent.schedule(self, stamp+self.getRefreshDelay(), updated=True,
+                changed=bool(flags & SAIAItemStore.FLAG_CHANGED))
+
+    def isSignificantChange(self, value, current):
+        """
+        return True if the value change has to be notified (called with the lock held)
+        """
+        return True
+
+    def clearDecodedValue(self):
+        """
+        called when the raw value changes, to invalidate any cached decoded value
+        """
+        pass
 
     def getValue(self):
         with self._parent._lock:
-            return self._value
+            return self.store.getValue(self._slot)
 
     @property
     def value(self):
@@ -289,35 +660,42 @@ class SAIAItem(object):
         if not self.isReadOnly():
             value=self.validateValue(value)
             with self._parent._lock:
-                if self._value!=value:
+                if self.isPushNeeded(value):
                     self.signalPush(value)
 
+    def isPushNeeded(self, value):
+        """
+        return True if the value has to be written, compared with the pending pushed value
+        if any, else with the current value (called with the lock held)
+        """
+        if self.isPendingPushRequest():
+            return self.store.getPushValue(self._slot)!=value
+        return self.store.getValue(self._slot)!=value
+
+    def subscribe(self, callback):
+        """
+        register a callback(item) fired when the item value changes
+        """
+        self._parent.subscribe(self._index, callback)
+
+    def unsubscribe(self, callback):
+        self._parent.unsubscribe(self._index, callback)
+
     def isRaised(self, reset=True):
-        raised=self._eventRaised.isSet()
-        if raised and reset:
-            self._eventRaised.clear()
-        return raised
+        return self.testAndClearFlag(SAIAItemStore.FLAG_RAISED, reset)
 
     def isChanged(self, reset=True):
-        changed=self._eventChanged.isSet()
-        if changed and reset:
-            self._eventChanged.clear()
-        return changed
+        return self.testAndClearFlag(SAIAItemStore.FLAG_CHANGED, reset)
 
     def isUpdated(self, reset=True):
-        if self._eventUpdated.isSet():
-            if reset:
-                self.clearUpdated()
-            return True
-        return False
+        return self.testAndClearFlag(SAIAItemStore.FLAG_UPDATED, reset)
 
     def clearUpdated(self):
-        self._eventUpdated.clear()
+        self.clearFlag(SAIAItemStore.FLAG_UPDATED)
 
     def waitUpdated(self, timeout=3.0):
         try:
-            self._eventUpdated.wait(timeout)
-            return True
+            return self.waitFlag(SAIAItemStore.FLAG_UPDATED, timeout)
         except:
             pass
         return False
@@ -331,11 +709,14 @@ class SAIAItem(object):
     @property
     def pushValue(self):
         with self._parent._lock:
-            return self._pushValue
+            return self.store.getPushValue(self._slot)
+
+    @property
+    def stamp(self):
+        return self.store.getStamp(self._slot)
 
     def age(self):
-        with self._parent._lock:
-            return time.time()-self._stamp
+        return time.time()-self.store.getStamp(self._slot)
 
     def isAlive(self, maxAge=None):
         if self.server.isAlive():
@@ -351,32 +732,140 @@ class SAIAItem(object):
     def push(self):
         return False
 
-    def manager(self):
-        age=self.age()
-        if age>=self.getRefreshDelay():
-            if age<180:
-                self.signalPull()
-            else:
-                # special case for non responsive items, avoiding
-                # permanent retries
-                if time.time()>=self._inhibitTimeout:
-                    self.signalPull()
-                    self._inhibitTimeout=time.time()+10.0
-
     def refresh(self, urgent=False):
         self.signalPull(urgent)
 
     def read(self, timeout=15.0):
+        if timeout<=0:
+            timeout=None
+        future=self.createPendingPushFuture()
+        if future is not None:
+            try:
+                future.result(timeout)
+            except:
+                self.discardFuture(future)
         self.refresh(urgent=True)
         try:
-            if timeout<=0:
-                timeout=None
-            self._eventValue.wait(timeout)
+            self.waitFlag(SAIAItemStore.FLAG_VALUE, timeout)
             return self.value
         except:
             pass
         return None
 
+    def createFuture(self, push=False):
+        """
+        return a (thread safe) concurrent.futures.Future resolved with the item value on
+        the next value update, or with the write result (True/False) on the next push ack
+        """
+        future=Future()
+        if not push and self.parent.isLocalNodeMode():
+            future.set_result(self.value)
+            return future
+
+        with self._parent._lock:
+            if push:
+                if self._futuresPush is None:
+                    self._futuresPush=[]
+                self._futuresPush.append(future)
+            else:
+                if self._futuresValue is None:
+                    self._futuresValue=[]
+                self._futuresValue.append(future)
+            # the item object must survive until the future is resolved
+            self.updatePin()
+        return future
+
+    def createPendingPushFuture(self):
+        """
+        return a future resolved by the ack of the item pending write (None if no write
+        is pending), the write being sent without waiting for the coalescing window.
+        A read issued before this ack may return the previous value
+        """
+        if self.parent.isLocalNodeMode():
+            return None
+        future=self.createFuture(push=True)
+        if self.isPendingPushRequest():
+            self.memory.flushWrites()
+            return future
+        self.discardFuture(future)
+
+    def discardFuture(self, future):
+        with self._parent._lock:
+            for futures in (self._futuresValue, self._futuresPush):
+                try:
+                    futures.remove(future)
+                except:
+                    pass
+            self.updatePin()
+        future.cancel()
+
+    def resolveFutures(self, result, push=False):
+        with self._parent._lock:
+            if push:
+                futures=self._futuresPush
+                self._futuresPush=None
+            else:
+                futures=self._futuresValue
+                self._futuresValue=None
+            self.updatePin()
+
+        if futures:
+            for future in futures:
+                try:
+                    if not future.done():
+                        future.set_result(result)
+                except:
+                    pass
+
+    def onPushDone(self, success):
+        """
+        called by the write request once the pushed value has been acked (or not)
+        """
+        if self._futuresPush:
+            self.resolveFutures(bool(success), push=True)
+
+    async def waitFuture(self, future, timeout=15.0, default=None):
+        try:
+            if timeout is not None and timeout<=0:
+                timeout=None
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.discardFuture(future)
+        return default
+
+    async def aread(self, timeout=15.0):
+        """
+        coroutine version of read(), returning the refreshed value (None on timeout)
+        """
+        future=self.createPendingPushFuture()
+        if future is not None:
+            await self.waitFuture(future, timeout)
+        future=self.createFuture()
+        self.refresh(urgent=True)
+        return await self.waitFuture(future, timeout)
+
+    async def awrite(self, value, timeout=15.0):
+        """
+        coroutine version of .value=value, returning True once the remote
+        server has acknowledged the write (False on NAK or timeout)
+        """
+        if self.isReadOnly():
+            return False
+
+        value=self.validateValue(value)
+        if self.parent.isLocalNodeMode():
+            self.setValue(value)
+            return True
+
+        future=self.createFuture(push=True)
+        with self._parent._lock:
+            if self.isPushNeeded(value):
+                self.signalPush(value)
+            elif not self.isPendingPushRequest():
+                # nothing to write
+                self.onPushDone(True)
+        return await self.waitFuture(future, timeout, False)
+
     def clear(self):
         self.value=0
 
@@ -393,8 +882,8 @@ class SAIAItem(object):
 
     def __repr__(self):
         tag=self.tag
-        raised=self._eventRaised.isSet()
-        changed=self._eventChanged.isSet()
+        raised=self.isFlag(SAIAItemStore.FLAG_RAISED)
+        changed=self.isFlag(SAIAItemStore.FLAG_CHANGED)
         if tag:
             return '<%s(index=%d, tag=%s, value=%s, age=%ds, refresh=%.01fs, alive=%d, raised=%d, changed=%d)>' % (self.__class__.__name__,
                 self.index, tag, self.strValue(), self.age(), self.getRefreshDelay(), self.isAlive(), raised, changed)
@@ -412,6 +901,8 @@ class SAIAItem(object):
 
 
 class SAIABooleanItem(SAIAItem):
+    __slots__=()
+
     def validateValue(self, value):
         try:
             return bool(value)
@@ -454,15 +945,87 @@ class SAIABooleanItem(SAIAItem):
 
 
 class SAIAAnalogItem(SAIAItem):
-    def onInit(self):
-        super(SAIAAnalogItem, self).onInit()
+    __slots__=('_formater', '_deadband', '_decoded')
+
+    def __init__(self, parent, index, slot):
+        super(SAIAAnalogItem, self).__init__(parent, index, slot)
         self._formater=None
+        self._deadband=None
+        self._decoded=None
+
+    def isSpecific(self):
+        if self._formater is not None or self._deadband is not None:
+            return True
+        return super(SAIAAnalogItem, self).isSpecific()
+
+    def setDeadband(self, deadband, percent=False):
+        """
+        Value changes smaller than the deadband (in decoded units, using the item formater)
+        aren't notified (changed flag, subscriptions). With percent, the deadband is given
+        in percent of the last notified value. The item value is still updated.
+        None to use the collection deadband, 0 to notify every change
+        """
+        with self._parent._lock:
+            if deadband is None:
+                self._deadband=None
+            else:
+                self._deadband=(abs(float(deadband)), bool(percent))
+            self._parent._deadbandReferences.pop(self._slot, None)
+            self.updatePin()
+
+    def getDeadband(self):
+        if self._deadband is not None:
+            return self._deadband
+        return self._parent._deadband
+
+    def decodeValue(self, value):
+        if self._formater is not None:
+            return self._formater.decode(value)
+        return value
+
+    def clearDecodedValue(self):
+        self._decoded=None
+
+    def getDecodedValue(self, formater):
+        """
+        return the value decoded by the given formater. The decoded value is memoized
+        (keyed on the raw value and the formater) until the raw value changes. Without
+        formater, the raw value is returned
+        """
+        value=self.getValue()
+        if formater is None:
+            return value
+        decoded=self._decoded
+        if decoded is not None and decoded[0]==value and decoded[1] is formater:
+            return decoded[2]
+        result=formater.decode(value)
+        self._decoded=(value, formater, result)
+        return result
+
+    def isSignificantChange(self, value, current):
+        deadband=self.getDeadband()
+        if deadband is None:
+            return True
+        (band, percent)=deadband
+        references=self._parent._deadbandReferences
+        # the reference is the last notified (raw) value
+        raw=references.get(self._slot, current)
+        try:
+            reference=self.decodeValue(raw)
+            if percent:
+                band=abs(reference)*band/100.0
+            if abs(self.decodeValue(value)-reference)<band:
+                references[self._slot]=raw
+                return False
+        except:
+            pass
+        references[self._slot]=value
+        return True
 
     def validateValue(self, value):
         try:
             if type(value)==float:
-                formater=SAIAValueFormaterFFP()
-                return formater.encode(value)
+                return FORMATER_FFP.encode(value)
 
             return int(value)
         except:
@@ -473,90 +1036,82 @@ class SAIAAnalogItem(SAIAItem):
         if formater:
             assert isinstance(formater, SAIAValueFormater)
             self._formater=formater
+            self.updatePin()
+
+    def setDefaultFormater(self, formater):
+        if not self._formater:
+            self.setFormater(formater)
 
     @property
     def formatedvalue(self):
+        formater=self._formater
+        if formater is None:
+            return self.value
         try:
-            return self._formater.decode(self.getValue())
+            return self.getDecodedValue(formater)
         except:
             return self.value
 
     @formatedvalue.setter
     def formatedvalue(self, value):
+        formater=self._formater
+        if formater is None:
+            self.value=value
+            return
         try:
-            self.value=self._formater.encode(value)
+            self.value=formater.encode(value)
         except:
             self.value=value
 
     @property
     def float32(self):
-        formater=SAIAValueFormaterFloat32()
-        if not self._formater:
-            self._formater=formater
-        return formater.decode(self.getValue())
+        self.setDefaultFormater(FORMATER_FLOAT32)
+        return self.getDecodedValue(FORMATER_FLOAT32)
 
     @float32.setter
     def float32(self, value):
-        formater=SAIAValueFormaterFloat32()
-        if not self._formater:
-            self._formater=formater
-        self.value=formater.encode(value)
+        self.setDefaultFormater(FORMATER_FLOAT32)
+        self.value=FORMATER_FLOAT32.encode(value)
 
     @property
     def sfloat32(self):
-        formater=SAIAValueFormaterSwappedFloat32()
-        if not self._formater:
-            self._formater=formater
-        return formater.decode(self.getValue())
+        self.setDefaultFormater(FORMATER_SWAPPEDFLOAT32)
+        return self.getDecodedValue(FORMATER_SWAPPEDFLOAT32)
 
     @sfloat32.setter
     def sfloat32(self, value):
-        formater=SAIAValueFormaterSwappedFloat32()
-        if not self._formater:
-            self._formater=formater
-        self.value=formater.encode(value)
+        self.setDefaultFormater(FORMATER_SWAPPEDFLOAT32)
+        self.value=FORMATER_SWAPPEDFLOAT32.encode(value)
 
     @property
     def int10(self):
-        formater=SAIAValueFormaterInteger10()
-        if not self._formater:
-            self._formater=formater
-        return formater.decode(self.getValue())
+        self.setDefaultFormater(FORMATER_INT10)
+        return self.getDecodedValue(FORMATER_INT10)
 
     @int10.setter
     def int10(self, value):
-        formater=SAIAValueFormaterInteger10()
-        if not self._formater:
-            self._formater=formater
-        self.value=formater.encode(value)
+        self.setDefaultFormater(FORMATER_INT10)
+        self.value=FORMATER_INT10.encode(value)
 
     @property
     def ffp(self):
-        formater=SAIAValueFormaterFFP()
-        if not self._formater:
-            self._formater=formater
-        return formater.decode(self.getValue())
+        self.setDefaultFormater(FORMATER_FFP)
+        return self.getDecodedValue(FORMATER_FFP)
 
     @ffp.setter
     def ffp(self, value):
-        formater=SAIAValueFormaterFFP()
-        if not self._formater:
-            self._formater=formater
-        self.value=formater.encode(value)
+        self.setDefaultFormater(FORMATER_FFP)
+        self.value=FORMATER_FFP.encode(value)
 
     @property
     def float(self):
-        formater=SAIAValueFormaterFFP()
-        if not self._formater:
-            self._formater=formater
-        return formater.decode(self.getValue())
+        self.setDefaultFormater(FORMATER_FFP)
+        return self.getDecodedValue(FORMATER_FFP)
 
     @float.setter
     def float(self, value):
-        formater=SAIAValueFormaterFFP()
-        if not self._formater:
-            self._formater=formater
-        self.value=formater.encode(value)
+        self.setDefaultFormater(FORMATER_FFP)
+        self.value=FORMATER_FFP.encode(value)
 
     def strValue(self):
         if self.value is not None:
@@ -579,19 +1134,43 @@ class SAIAAnalogItem(SAIAItem):
 
 
 class SAIAItems(object):
+    """
+    Items collection. Items state is kept in a columnar store, items objects being created
+    on access (and cached as long as they are used). Declared items are merged into frame sized read blocks (read plan).
+    Remote blocks refreshes are scheduled in a heap keyed on the block's next due time,
+    so that the manager only touches blocks that are actually due.
+    """
+
+    # max items count in a read frame
+    FRAME_MAXCOUNT = 32
+    # max items count in a write frame (accepted by every PCD, and by the local node)
+    FRAME_MAXCOUNT_WRITE = 32
+
     def __init__(self, memory, itemType, maxsize, readOnly=False):
         assert memory.__class__.__name__=='SAIAMemory'
         self._memory=memory
         self._localNodeMode=memory.isLocalNodeMode()
         self._lock=RLock()
+        self._condition=Condition(self._lock)
+        self._waiters=0
+        self._subscribers={}
+        self._rangeSubscribers=[]
+        self._subscribed=False
+        self._deadband=None
+        self._deadbandReferences={}
+        self._adaptiveRefresh=None
         self._itemType=itemType
         self._maxsize=maxsize
         self._readOnly=readOnly
-        self._items=[]
-        self._indexItem={}
-        self._timeoutSort=0
+        self._store=self.createStore()
+        self._proxies=weakref.WeakValueDictionary()
+        self._pinned={}
+        self._timeoutCompact=0
         self._currentItem=0
         self._delayRefresh=60
+        self._deadlines=[]
+        self._deadlinesCount=0
+        self._plan=SAIAReadPlan(self, self.FRAME_MAXCOUNT)
 
     @property
     def memory(self):
@@ -618,13 +1197,303 @@ class SAIAItems(object):
 
     def setRefreshDelay(self, delay):
         self._delayRefresh=delay
+        self.rescheduleBlocks()
 
     def getRefreshDelay(self):
         return self._delayRefresh
 
+    def setAdaptiveRefresh(self, minDelay, maxDelay=None):
+        """
+        Enable the adaptive refresh mode : each read block refresh delay is moved between minDelay
+        and maxDelay, getting shorter when block values are changing and longer when they are stable.
+        setAdaptiveRefresh(None) restores the fixed refresh delays
+        """
+        with self._lock:
+            if minDelay is None:
+                self._adaptiveRefresh=None
+            else:
+                if maxDelay is None:
+                    maxDelay=max(minDelay, self._delayRefresh)
+                self._adaptiveRefresh=(float(minDelay), float(max(minDelay, maxDelay)))
+            for block in self._plan:
+                block._delayAdaptive=None
+        self.rescheduleBlocks()
+
+    def getAdaptiveRefresh(self):
+        """
+        return the adaptive refresh (minDelay, maxDelay) bounds, None if disabled
+        """
+        return self._adaptiveRefresh
+
+    def setDeadband(self, deadband, percent=False):
+        """
+        Set the (analog) items default deadband : value changes smaller than the deadband
+        (in decoded units) aren't notified. None to disable
+        """
+        with self._lock:
+            if deadband is None:
+                self._deadband=None
+            else:
+                self._deadband=(abs(float(deadband)), bool(percent))
+            self._deadbandReferences={}
+
+    def getDeadband(self):
+        return self._deadband
+
     def count(self):
+        return len(self._store)
+
+    def __len__(self):
+        return self.count()
+
+    def createStore(self):
+        return SAIAItemStore('L')
+
+    def notify(self):
+        """
+        wake up the threads waiting for an item state. Must be called with the lock held
+        """
+        if self._waiters:
+            self._condition.notify_all()
+
+    def subscribe(self, indexes, callback):
+        """
+        register a callback(item) fired when the value of one of the given items changes.
+        indexes may be an index (or item), a list of indexes (or items), or a range
+        (i.e. registers.subscribe(range(100, 200), callback)), covering declared and
+        not yet declared items. Callbacks are called by the thread updating the item values
+        """
+        with self._lock:
+            if isinstance(indexes, range):
+                self._rangeSubscribers=self._rangeSubscribers+[(indexes, callback)]
+            else:
+                for index in self.subscriptionIndexes(indexes):
+                    callbacks=self._subscribers.get(index, [])
+                    if callback not in callbacks:
+                        self._subscribers[index]=callbacks+[callback]
+            self._subscribed=True
+
+    def unsubscribe(self, indexes, callback):
+        with self._lock:
+            if isinstance(indexes, range):
+                self._rangeSubscribers=[s for s in self._rangeSubscribers if s!=(indexes, callback)]
+            else:
+                for index in self.subscriptionIndexes(indexes):
+                    callbacks=[c for c in self._subscribers.get(index, []) if c!=callback]
+                    if callbacks:
+                        self._subscribers[index]=callbacks
+                    else:
+                        self._subscribers.pop(index, None)
+            self._subscribed=bool(self._subscribers or self._rangeSubscribers)
+
+    def subscriptionIndexes(self, indexes):
+        if isinstance(indexes, (list, tuple, set)):
+            return [self.subscriptionIndex(index) for index in indexes]
+        return [self.subscriptionIndex(indexes)]
+
+    def subscriptionIndex(self, index):
+        if isinstance(index, SAIAItem):
+            return index.index
+        return self.validateIndex(index)
+
+    def subscribers(self, index):
+        """
+        return the callbacks subscribed to the given index
+        """
+        callbacks=list(self._subscribers.get(index, []))
+        for (indexes, callback) in self._rangeSubscribers:
+            if index in indexes:
+                callbacks.append(callback)
+        return callbacks
+
+    def notifyChange(self, item):
+        """
+        fire the callbacks subscribed to the (changed) item
+        """
+        for callback in self.subscribers(item.index):
+            try:
+                callback(item)
+            except:
+                self.logger.exception('notifyChange(%s)' % item)
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def plan(self):
+        return self._plan
+
+    def proxy(self, index, slot=None):
+        """
+        return the item object of a (validated) declared index, None if not declared.
+        Must be called with the lock held
+        """
+        item=self._proxies.get(index)
+        if item is None:
+            if slot is None:
+                slot=self._store.slot(index)
+                if slot is None:
+                    return None
+            item=self._itemType(self, index, slot)
+            self._proxies[index]=item
+        return item
+
+    def compactProxies(self):
+        """
+        rebuild the item objects cache, releasing the memory of the dead entries (a dict never shrinks)
+        """
+        with self._lock:
+            self._proxies=weakref.WeakValueDictionary(self._proxies)
+
+    def pin(self, item):
+        """
+        keep the item object alive (item with a specific state)
+        """
+        with self._lock:
+            self._pinned[item.index]=item
+
+    def unpin(self, item):
+        with self._lock:
+            self._pinned.pop(item.index, None)
+
+    def createReadRequest(self):
+        """
+        return a new (not setup) read request for this collection
+        """
+        return None
+
+    def createReadRangeRequest(self):
+        """
+        return a new (not setup) raw range read request for this collection
+        """
+        return None
+
+    def createRangeBuffer(self, count):
+        """
+        return a buffer able to receive count raw values
+        """
+        return [0]*count
+
+    def copyValues(self):
+        """
+        return a copy of the store values column (must be called with the lock held)
+        """
+        return self._store.copyValues()
+
+    def orderValues(self, values, indexes, slots):
+        """
+        return the copied values (copyValues) in indexes order
+        """
+        if numpy is not None:
+            return numpy.frombuffer(values, dtype=numpy.dtype(values.typecode))[slots]
+        return [values[slot] for slot in slots]
+
+    def decodedValues(self, formater=None):
+        """
+        Return the declared items values as {index: decoded value}. The values are converted
+        at once by the given formater (raw values if None), items having their own formater
+        being decoded with it (memoized per item)
+        """
+        with self._lock:
+            store=self._store
+            indexes=store._indexes[:]
+            slots=store._slots[:]
+            values=self.copyValues()
+            items=[item for item in self._pinned.values() if getattr(item, '_formater', None) is not None]
+
+        if numpy is not None:
+            slots=numpy.frombuffer(slots, dtype=numpy.dtype(slots.typecode))
+        values=self.orderValues(values, indexes, slots)
+        if formater is not None:
+            values=formater.decodeMany(values)
+        if numpy is not None:
+            values=values.tolist()
+        decoded=dict(zip(indexes, values))
+        for item in items:
+            if item._formater is not formater:
+                decoded[item.index]=item.formatedvalue
+        return decoded
+
+    def snapshot(self, formater=None):
+        """
+        Return the declared items state as {'index', 'value', 'stamp', 'age', 'alive'} arrays
+        (numpy arrays if available, index sorted), value being the raw value. The store columns
+        are copied under a single lock acquisition, the arrays being built once the lock released.
+        If a formater is given, the values are also converted at once in a 'decoded' array
+        """
+        with self._lock:
+            store=self._store
+            indexes=store._indexes[:]
+            slots=store._slots[:]
+            stamps=store._stamps[:]
+            values=self.copyValues()
+            delays={index: item.getRefreshDelay() for (index, item) in self._pinned.items()}
+        now=time.time()
+        maxAge=max(self._delayRefresh*1.5, 15.0)
+        alive=self.server.isAlive()
+
+        if numpy is not None:
+            slots=numpy.frombuffer(slots, dtype=numpy.dtype(slots.typecode))
+            indexes=numpy.frombuffer(indexes, dtype=numpy.dtype(indexes.typecode)).copy()
+            stamps=numpy.frombuffer(stamps, dtype=numpy.float64)[slots]
+            ages=now-stamps
+            maxAges=numpy.full(len(indexes), maxAge)
+            for (index, delay) in delays.items():
+                maxAges[numpy.searchsorted(indexes, index)]=max(delay*1.5, 15.0)
+            alives=(ages<=maxAges) & alive
+        else:
+            stamps=[stamps[slot] for slot in slots]
+            ages=[now-stamp for stamp in stamps]
+            alives=[alive and age<=max(delays[index]*1.5, 15.0) if index in delays else alive and age<=maxAge
+                for (index, age) in zip(indexes, ages)]
+
+        snapshot={'index': indexes,
+                'value': self.orderValues(values, indexes, slots),
+                'stamp': stamps,
+                'age': ages,
+                'alive': alives}
+        if formater is not None:
+            snapshot['decoded']=formater.decodeMany(snapshot['value'])
+        return snapshot
+
+    def getRangeValues(self, index, count):
+        """
+        return the stored values of the given range (0 for not declared items)
+        """
+        values=[0]*count
         with self._lock:
-            return len(self._items)
+            store=self._store
+            indexes=store._indexes
+            n=bisect_left(indexes, index)
+            while n<len(indexes) and indexes[n]<index+count:
+                values[indexes[n]-index]=store.getValue(store._slots[n])
+                n+=1
+        return values
+
+    def createWriteRequest(self):
+        """
+        return a new (not setup) write request for this collection, None if not writable
+        """
+        return None
+
+    def readBlock(self, index):
+        """
+        return the read plan block covering the given index (or None)
+        """
+        with self._lock:
+            return self._plan.block(index)
+
+    def setHoleCost(self, holeCost, frameCost=None):
+        """
+        Set the read plan cost model. A hole (not declared items) is read within a frame if
+        its size*holeCost is not greater than frameCost (default, the frame maxcount).
+        holeCost=0 reads every hole fitting in a frame, a high holeCost disables holes reading
+        """
+        with self._lock:
+            (replaced, created)=self._plan.setHoleCost(holeCost, frameCost)
+            self.replaceBlocks(replaced, created)
+        self.server.signalReady()
 
     def resolveIndex(self, index):
         """
@@ -648,13 +1517,18 @@ class SAIAItems(object):
         except:
             pass
 
+    def getMaxSize(self):
+        return self._maxsize
+
     def isIndexValid(self, index):
         if self.validateIndex(index) is not None:
             return True
         return False
 
     def all(self):
-        return self._items
+        with self._lock:
+            store=self._store
+            return [self.proxy(index, slot) for (index, slot) in zip(store._indexes, store._slots)]
 
     def alive(self, maxAge=None):
         with self._lock:
@@ -672,8 +1546,9 @@ class SAIAItems(object):
 
     def item(self, index):
         try:
+            index=self.validateIndex(index)
             with self._lock:
-                return self._indexItem[self.validateIndex(index)]
+                return self.proxy(index)
         except:
             pass
 
@@ -692,9 +1567,47 @@ class SAIAItems(object):
                 return self.declareForTagMatching(index[1:])
         except:
             pass
-        if self.memory.isOnTheFlyItemCreationEnabled():
+        if self.isOnTheFlyDeclarationAllowed(index):
             return self.declare(index)
 
+    def isOnTheFlyDeclarationAllowed(self, index):
+        """
+        return True if the given (not declared) index can be declared on access
+        """
+        memory=self.memory
+        if memory.isOnTheFlyItemCreationEnabled():
+            maxItems=memory.getOnTheFlyItemLimit()
+            if maxItems is not None and self.count()>=maxItems:
+                return False
+            index=self.validateIndex(index)
+            if index is not None:
+                with self._lock:
+                    return self._store.canAllocate(index)
+        return False
+
+    def canWriteRange(self, index, count):
+        """
+        return True if every item of the range is declared or can be declared on the fly, the
+        items count limit and the store capacity (image pages cap, bitset size) being checked for
+        the whole range. A refused range is counted in the image stats (local analog items)
+        """
+        if count<=0 or index<0 or index+count>self._maxsize:
+            return False
+        allowed=True
+        missing=[n for n in range(index, index+count) if not self.isItemDeclared(n)]
+        if missing:
+            memory=self.memory
+            maxItems=memory.getOnTheFlyItemLimit()
+            if not memory.isOnTheFlyItemCreationEnabled():
+                allowed=False
+            elif maxItems is not None and self.count()+len(missing)>maxItems:
+                allowed=False
+        with self._lock:
+            if allowed and self._store.canAllocateRange(index, count):
+                return True
+            self._store.refuse()
+        return False
+
     def declare(self, index, value=0):
         index=self.validateIndex(index)
         if index is not None:
@@ -702,14 +1615,21 @@ class SAIAItems(object):
             if item:
                 return item
 
-            item=self._itemType(self, index, value)
-            # item.setReadOnly(self._readOnly)
             with self._lock:
-                self._items.append(item)
-                self._indexItem[index]=item
-                self._timeoutSort=time.time()+10.0
+                item=self.proxy(index)
+                if item:
+                    return item
+                slot=self._store.add(index)
+                item=self.proxy(index, slot)
+                # a persistent (memory mapped) store keeps the last value of the item
+                if value or not self._store.isPersistent():
+                    self._store.setValue(slot, item.validateValue(value))
+                item.onInit()
+                (replaced, created)=self._plan.add(index)
+                self.replaceBlocks(replaced, created)
                 item.signalPull()
-                return item
+            self.logger.debug('%s->creating %s' % (self.server.host, item))
+            return item
 
     def declareFromList(self, indexes, value=0):
         items=[]
@@ -745,46 +1665,119 @@ class SAIAItems(object):
 
     def signalPush(self, item):
         self.memory._queuePendingPush.put(item)
+        self.server.signalReady()
 
     def signalPull(self, item, urgent=False):
         if urgent:
             self.memory._queuePendingPriorityPull.put(item)
         else:
             self.memory._queuePendingPull.put(item)
+        self.server.signalReady()
 
     def refresh(self):
+        for item in self.all():
+            item.refresh()
+
+    def schedule(self, item, stamp, updated=False, changed=False):
+        """
+        the item needs to be refreshed at the given time (or has just been updated,
+        with a changed value or not). The item's block deadline is lowered accordingly
+        """
+        self.scheduleIndex(item.index, stamp, updated, changed)
+
+    def scheduleIndex(self, index, stamp, updated=False, changed=False):
+        if self._localNodeMode or stamp is None:
+            return
+        with self._lock:
+            block=self._plan.block(index)
+            if block:
+                if changed:
+                    block._changed=True
+                if updated and block._pending:
+                    # first value received from the block read
+                    block.onUpdate()
+                    if block._delayAdaptive is not None:
+                        stamp=time.time()+block._delayAdaptive
+                    self.scheduleBlock(block, stamp)
+                elif block._due is None or stamp<block._due:
+                    self.scheduleBlock(block, stamp)
+
+    def scheduleBlock(self, block, stamp):
+        """
+        (re)schedule the block's next refresh check. Previous heap entries of the
+        block are not removed but ignored when popped (lazy invalidation)
+        """
+        if self._localNodeMode or stamp is None:
+            return
+        with self._lock:
+            block._due=stamp
+            self._deadlinesCount+=1
+            heapq.heappush(self._deadlines, (stamp, self._deadlinesCount, block))
+            if len(self._deadlines)>4*len(self._plan)+64:
+                self.compactDeadlines()
+
+    def replaceBlocks(self, replaced, created):
         with self._lock:
-            for item in self._items:
-                item.refresh()
+            for block in replaced:
+                block._due=None
+            for block in created:
+                self.scheduleBlock(block, time.time())
+
+    def rescheduleBlocks(self):
+        with self._lock:
+            for block in self._plan:
+                self.scheduleBlock(block, time.time())
+        self.server.signalReady()
+
+    def compactDeadlines(self):
+        with self._lock:
+            self._deadlines=[entry for entry in self._deadlines if entry[2]._due==entry[0]]
+            heapq.heapify(self._deadlines)
+
+    def nextDeadline(self):
+        """
+        return the next item due time (or None)
+        """
+        with self._lock:
+            if self._deadlines:
+                return self._deadlines[0][0]
+
+    def countScheduled(self):
+        return len(self._deadlines)
 
     def manager(self):
-        count=min(64, len(self._items))
+        activity=False
+        now=time.time()
+        if now>=self._timeoutCompact:
+            self._timeoutCompact=now+60.0
+            self.compactProxies()
+
+        count=256
         while count>0:
+            with self._lock:
+                if not self._deadlines or self._deadlines[0][0]>now:
+                    break
+                (stamp, n, block)=heapq.heappop(self._deadlines)
+                if block._due!=stamp:
+                    # obsolete entry
+                    continue
+                block._due=None
+
             count-=1
             try:
-                with self._lock:
-                    item=self._items[self._currentItem]
-                    self._currentItem+=1
-
-                try:
-                    item.manager()
-                except:
-                    self.logger.exception('manager()')
+                self.scheduleBlock(block, block.manager())
             except:
-                self._currentItem=0
-                if self._timeoutSort>0:
-                    with self._lock:
-                        if time.time()>self._timeoutSort:
-                            # sortimg indexes is useful for request index optimisers
-                            self.logger.info('%s re-sorting items indexes' % self)
-                            self._items.sort(key=lambda i: i.index)
-                            self._timeoutSort=0
-                break
+                self.logger.exception('manager()')
+                self.scheduleBlock(block, now+5.0)
+        else:
+            # due items left for the next pass
+            activity=True
+
+        return activity
 
     def dump(self):
-        with self._lock:
-            for item in self._items:
-                print(item)
+        for item in self.all():
+            print(item)
 
     def table(self, key=None):
         with self._lock:
@@ -801,7 +1794,7 @@ class SAIAItems(object):
                 if not deviceName:
                     deviceName=self.server.host
 
-                for item in self._items:
+                for item in self.all():
                     if key and not item.match(key):
                         continue
                     age='%.01fs' % item.age()
@@ -810,16 +1803,16 @@ class SAIAItems(object):
                 print(t)
 
     def clear(self):
-        with self._lock:
-            for item in self._items:
-                item.clear()
+        for item in self.all():
+            item.clear()
 
     def __repr__(self):
-        return '<%s(%d items, max=%d, readOnly=%d, current=%d, refresh=%.01fs)>' % (self.__class__.__name__,
+        return '<%s(%d items, max=%d, readOnly=%d, blocks=%d, scheduled=%d, refresh=%.01fs)>' % (self.__class__.__name__,
                     self.count(),
                     self._maxsize,
                     bool(self._readOnly),
-                    self._currentItem,
+                    len(self._plan),
+                    self.countScheduled(),
                     self._delayRefresh)
 
 
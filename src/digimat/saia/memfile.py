@@ -0,0 +1,118 @@
+from __future__ import division
+
+import os
+import mmap
+
+
+class SAIAMemoryFile(object):
+    """
+    Memory mapped file backing the local node memory. The file has a fixed layout : a header
+    page (magic) followed by one section per items type, each section being the raw image of
+    the type (bitsets for inputs, outputs and flags, big-endian UINT32 for registers and
+    counters, see LAYOUT). The local stores read and write their values straight into the
+    mapped sections, so that a restarted node serves the last values as soon as the file is
+    mapped (no load loop). Not yet written parts of the file are sparse (holes).
+    """
+
+    MAGIC = b'SAIAMEM1'
+    HEADER_SIZE = 4096
+
+    LAYOUT = (('inputs', 65536//8),
+              ('outputs', 65536//8),
+              ('flags', 65536//8),
+              ('registers', 65536*4),
+              ('counters', 65536*4))
+
+    def __init__(self, path, logger=None):
+        self._path=path
+        self._logger=logger
+        self._file=None
+        self._mmap=None
+        self._sections={}
+        self._created=False
+        self.open()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def logger(self):
+        return self._logger
+
+    def size(self):
+        return self.HEADER_SIZE+sum([size for (name, size) in self.LAYOUT])
+
+    def isCreated(self):
+        """
+        return True if the file has been (re)initialized when opened (no previous values)
+        """
+        return self._created
+
+    def open(self):
+        size=self.size()
+        try:
+            f=open(self._path, 'r+b')
+        except (IOError, OSError):
+            f=open(self._path, 'w+b')
+
+        f.seek(0, os.SEEK_END)
+        if f.tell()!=size or self.readMagic(f)!=self.MAGIC:
+            if f.tell()>0 and self.logger:
+                self.logger.warning('memory file %s layout mismatch, reinitialized' % self._path)
+            # new (sparse) file
+            f.truncate(0)
+            f.truncate(size)
+            f.seek(0)
+            f.write(self.MAGIC)
+            f.flush()
+            self._created=True
+
+        self._file=f
+        self._mmap=mmap.mmap(f.fileno(), size)
+        view=memoryview(self._mmap)
+        offset=self.HEADER_SIZE
+        for (name, size) in self.LAYOUT:
+            self._sections[name]=view[offset:offset+size]
+            offset+=size
+
+    def readMagic(self, f):
+        f.seek(0)
+        return f.read(len(self.MAGIC))
+
+    def section(self, name):
+        """
+        return the mapped (writable) buffer of the given items type (or None)
+        """
+        return self._sections.get(name)
+
+    def flush(self):
+        try:
+            if self._mmap is not None:
+                self._mmap.flush()
+        except:
+            pass
+
+    def close(self):
+        """
+        flush and close the file (the map itself is only closed once the stores are released)
+        """
+        self.flush()
+        self._sections={}
+        try:
+            self._mmap.close()
+        except:
+            pass
+        try:
+            self._file.close()
+        except:
+            pass
+        self._mmap=None
+        self._file=None
+
+    def __repr__(self):
+        return '<%s(%s, %d bytes)>' % (self.__class__.__name__, self._path, self.size())
+
+
+if __name__ == "__main__":
+    pass
@@ -2,12 +2,27 @@ from __future__ import print_function  # Python 2/3 compatibility
 
 # python2-3 compatibility require 'pip install future'
 from queue import Queue
+from collections import deque
 import time
+from array import array
+from bisect import bisect_left
 
 from .items import SAIABooleanItem
 from .items import SAIAAnalogItem
 from .items import SAIAItems
-
+from .store import SAIAItemStore
+from .store import SAIABooleanItemStore
+from .store import SAIAImageItemStore
+from .store import SAIATimerItemStore
+from .wheel import SAIATimerWheel
+from .memfile import SAIAMemoryFile
+from .bitset import bin2bits
+from .bitset import numpy
+
+from .request import SAIARequest
+from .request import SAIARequestReadRange
+from .request import decodeRangePayload
+from .request import UINT32
 from .request import SAIARequestReadFlags
 from .request import SAIARequestWriteFlags
 from .request import SAIARequestReadInputs
@@ -24,22 +39,65 @@ from .symbol import SAIASymbol
 
 
 class SAIAItemQueue(Queue):
+    """
+    FIFO items queue ignoring already queued items. Queued items are tracked
+    in a set, giving O(1) put() and get()
+    """
+
     def _init(self, maxsize):
-        self._queue=[]
+        self._queue=deque()
+        self._queued=set()
+        self._countPut=0
+        self._countDuplicate=0
+        self._countPeak=0
 
     def _qsize(self):
         return len(self._queue)
 
     def _put(self, item):
-        if item not in self._queue:
-            self._queue.insert(0, item)
+        if item in self._queued:
+            self._countDuplicate+=1
+            return
+        self._queued.add(item)
+        self._queue.append(item)
+        self._countPut+=1
+        if len(self._queue)>self._countPeak:
+            self._countPeak=len(self._queue)
 
     def _get(self):
-        item=self._queue.pop()
+        item=self._queue.popleft()
+        self._queued.discard(item)
+        if not self._queue and len(self._queued)==0:
+            # release the set table (a set never shrinks)
+            self._queued=set()
         return item
 
+    def count(self):
+        return self.qsize()
+
+    def countPut(self):
+        return self._countPut
+
+    def countDuplicate(self):
+        return self._countDuplicate
+
+    def countPeak(self):
+        return self._countPeak
+
+    def resetCounters(self):
+        with self.mutex:
+            self._countPut=0
+            self._countDuplicate=0
+            self._countPeak=len(self._queue)
+
+    def __repr__(self):
+        return '<%s(%d items, peak=%d, put=%d, duplicate=%d)>' % (self.__class__.__name__,
+            self.count(), self._countPeak, self._countPut, self._countDuplicate)
+
 
 class SAIAItemFlag(SAIABooleanItem):
+    __slots__=()
+
     def onInit(self):
         super(SAIAItemFlag, self).onInit()
 
@@ -62,6 +120,8 @@ class SAIAItemFlag(SAIABooleanItem):
 
 
 class SAIAItemInput(SAIABooleanItem):
+    __slots__=()
+
     def onInit(self):
         super(SAIAItemInput, self).onInit()
         self.setReadOnly()
@@ -73,6 +133,8 @@ class SAIAItemInput(SAIABooleanItem):
 
 
 class SAIAItemOutput(SAIABooleanItem):
+    __slots__=()
+
     def onInit(self):
         super(SAIAItemOutput, self).onInit()
 
@@ -88,6 +150,8 @@ class SAIAItemOutput(SAIABooleanItem):
 
 
 class SAIAItemRegister(SAIAAnalogItem):
+    __slots__=()
+
     def onInit(self):
         super(SAIAItemRegister, self).onInit()
 
@@ -110,10 +174,7 @@ class SAIAItemRegister(SAIAAnalogItem):
 
 
 class SAIAItemTimer(SAIAAnalogItem):
-    def onInit(self):
-        super(SAIAItemTimer, self).onInit()
-        if self.parent.isLocalNodeMode():
-            self._stampTimer=0
+    __slots__=()
 
     def pull(self):
         request=SAIARequestReadTimers(self.server.link)
@@ -132,24 +193,25 @@ class SAIAItemTimer(SAIAAnalogItem):
         except:
             return 't%d' % self.index
 
-    def decrementTimer(self):
+    def setValue(self, value, force=False):
+        super(SAIAItemTimer, self).setValue(value, force)
         if self.parent.isLocalNodeMode():
-            if self.value>0 and self._stampTimer>0:
-                baseTime=self.parent._tickBaseTime
-                elapsed=int((time.time()-self._stampTimer)/baseTime)
-                if elapsed>0:
-                    self._stampTimer+=elapsed*baseTime
-                    if self.value>elapsed:
-                        self.value-=elapsed
-                    else:
-                        self.value=0
-                        self.logger.info('<%s(index=%d)> Timeout!' % (self.__class__.__name__, self.index))
-
-            self._stampTimer=time.time()
-
-    def manager(self):
-        super(SAIAItemTimer, self).manager()
-        self.decrementTimer()
+            # local timers are computed on read, only the timeout is scheduled
+            self.parent.scheduleTimeout(self)
+
+    def onTimeout(self):
+        """
+        local timer has reached 0 : the value is written back (notified as changed)
+        """
+        store=self.store
+        with self._parent._lock:
+            store.setValue(self._slot, 0)
+            store.setStamp(self._slot, time.time())
+            self.clearDecodedValue()
+            self.setFlags(SAIAItemStore.FLAG_VALUE | SAIAItemStore.FLAG_UPDATED | SAIAItemStore.FLAG_CHANGED)
+        if self._parent._subscribed:
+            self._parent.notifyChange(self)
+        self.logger.info('<%s(index=%d)> Timeout!' % (self.__class__.__name__, self.index))
 
     def isTimeout(self):
         if self.value<=0:
@@ -158,6 +220,8 @@ class SAIAItemTimer(SAIAAnalogItem):
 
 
 class SAIAItemCounter(SAIAAnalogItem):
+    __slots__=()
+
     def onInit(self):
         super(SAIAItemCounter, self).onInit()
 
@@ -191,13 +255,160 @@ class SAIAItemCounter(SAIAAnalogItem):
 
 
 class SAIABooleanItems(SAIAItems):
-    pass
+    FRAME_MAXCOUNT = 96
+    SECTION = None
+
+    def createStore(self):
+        if self.isLocalNodeMode():
+            return SAIABooleanItemStore(buffer=self.memory.mappedBuffer(self.SECTION))
+        return SAIABooleanItemStore()
+
+    def createReadRangeRequest(self):
+        return SAIARequestReadRange(self.server.link, self.COMMAND_READ, boolean=True)
+
+    def createRangeBuffer(self, count):
+        return bytearray(count)
+
+    def getRangeValues(self, index, count):
+        """
+        return the values of the items range as 0/1 bytes (not declared items being read as 0)
+        """
+        return decodeRangePayload(self.getBytes(index, count), count, True)
+
+    def copyValues(self):
+        return bytes(self._store._bits.data)
+
+    def orderValues(self, values, indexes, slots):
+        if numpy is not None:
+            bits=numpy.unpackbits(numpy.frombuffer(values, dtype=numpy.uint8), bitorder='little')
+            # indexes beyond the allocated bitset are clear
+            indexes=numpy.asarray(indexes)
+            values=numpy.zeros(len(indexes), dtype=bool)
+            inside=indexes<len(bits)
+            values[inside]=bits[indexes[inside]].astype(bool)
+            return values
+        return [bool(index>>3<len(values) and values[index >> 3] & (1 << (index & 7))) for index in indexes]
+
+    def declareOnTheFly(self, index, count):
+        """
+        declare the missing items of the range if on the fly items creation is enabled
+        """
+        if self.memory.isOnTheFlyItemCreationEnabled():
+            with self._lock:
+                missing=~self._store.getDeclaredBits(index, count) & ((1 << count)-1)
+            if missing:
+                for n in range(count):
+                    if (missing >> n) & 1 and self.isOnTheFlyDeclarationAllowed(index+n):
+                        self.declare(index+n)
+
+    def getBytes(self, index, count):
+        """
+        return the values of the items range as packed bytes (frame payload), not declared
+        items being read as False (without being declared)
+        """
+        with self._lock:
+            return self._store.getBytes(index, count)
+
+    def setBytes(self, index, count, data, force=False, clear=0):
+        """
+        set the values of the items range from packed bytes (frame payload)
+        """
+        self.declareOnTheFly(index, count)
+        return self.setBits(index, count, bin2bits(data), force, clear)
+
+    def setBits(self, index, count, bits, force=False, clear=0):
+        """
+        Frame sized bulk setValue() of the declared items in range (bit n of bits being the
+        value of index+n), updating the store values with a single bitset operation.
+        Without force, only the writable items whose value differs are updated (as with
+        item.value=value). The given flags (clear) are cleared on the updated items.
+        Return the count of updated items
+        """
+        store=self._store
+        now=time.time()
+        updated=[]
+        futures=[]
+        changes=[]
+        with self._lock:
+            declared=store.getDeclaredBits(index, count)
+            if not declared:
+                return 0
+            current=store.getBits(index, count)
+            if force:
+                mask=declared
+            else:
+                if self.isReadOnly():
+                    return 0
+                mask=(current ^ bits) & declared
+            changed=(current ^ bits) & mask
+            raised=~current & bits & mask
+
+            indexes=store._indexes
+            slots=store._slots
+            flags=store._flags
+            stamps=store._stamps
+            n=bisect_left(indexes, index)
+            while n<len(indexes) and indexes[n]<index+count:
+                i=indexes[n]
+                slot=slots[n]
+                n+=1
+                bit=1 << (i-index)
+                if not mask & bit:
+                    continue
+                if not force and flags[slot] & SAIAItemStore.FLAG_READONLY:
+                    mask&=~bit
+                    continue
+                f=SAIAItemStore.FLAG_VALUE | SAIAItemStore.FLAG_UPDATED
+                # only if we have already received a value
+                if stamps[slot]>0 or self._localNodeMode:
+                    if changed & bit:
+                        f |= SAIAItemStore.FLAG_CHANGED
+                    if raised & bit:
+                        f |= SAIAItemStore.FLAG_RAISED
+                stamps[slot]=now
+                flags[slot]=(flags[slot] | f) & ~clear
+                updated.append((i, bool(f & SAIAItemStore.FLAG_CHANGED)))
+                if f & SAIAItemStore.FLAG_CHANGED and self._subscribed:
+                    changes.append(self.proxy(i, slot))
+                item=self._pinned.get(i)
+                if item is not None and item._futuresValue:
+                    futures.append(item)
+
+            store.setBits(index, count, bits, mask)
+            if updated:
+                self.notify()
+
+        for item in futures:
+            item.resolveFutures(item.value)
+
+        for item in changes:
+            self.notifyChange(item)
+
+        if not self._localNodeMode:
+            for (i, changed) in updated:
+                item=self._pinned.get(i)
+                if item is not None:
+                    delay=item.getRefreshDelay()
+                else:
+                    delay=self._delayRefresh
+                self.scheduleIndex(i, now+delay, updated=True, changed=changed)
+
+        return len(updated)
 
 
 class SAIAFlags(SAIABooleanItems):
+    COMMAND_READ = SAIARequest.COMMAND_READ_FLAGS
+    SECTION = 'flags'
+
     def __init__(self, memory, maxsize=65535):
         super(SAIAFlags, self).__init__(memory, SAIAItemFlag, maxsize)
 
+    def createReadRequest(self):
+        return SAIARequestReadFlags(self.server.link)
+
+    def createWriteRequest(self):
+        return SAIARequestWriteFlags(self.server.link)
+
     def resolveIndex(self, key):
         try:
             if isinstance(key, SAIASymbol) and key.isFlag():
@@ -222,24 +433,101 @@ class SAIAFlags(SAIABooleanItems):
 
 
 class SAIAInputs(SAIABooleanItems):
+    COMMAND_READ = SAIARequest.COMMAND_READ_INPUTS
+    SECTION = 'inputs'
+
     def __init__(self, memory, maxsize=65535):
         super(SAIAInputs, self).__init__(memory, SAIAItemInput, maxsize)
         self.setReadOnly()
 
+    def createReadRequest(self):
+        return SAIARequestReadInputs(self.server.link)
+
 
 class SAIAOutputs(SAIABooleanItems):
+    COMMAND_READ = SAIARequest.COMMAND_READ_OUTPUTS
+    SECTION = 'outputs'
+
     def __init__(self, memory, maxsize=65535):
         super(SAIAOutputs, self).__init__(memory, SAIAItemOutput, maxsize)
 
+    def createReadRequest(self):
+        return SAIARequestReadOutputs(self.server.link)
+
+    def createWriteRequest(self):
+        return SAIARequestWriteOutputs(self.server.link)
+
 
 class SAIAAnalogItems(SAIAItems):
-    pass
+    SECTION = None
+
+    def createStore(self):
+        if self.isLocalNodeMode():
+            return SAIAImageItemStore(self._maxsize, buffer=self.memory.mappedBuffer(self.SECTION))
+        return super(SAIAAnalogItems, self).createStore()
+
+    def getBytes(self, index, count):
+        """
+        return the values of the items range as big-endian UINT32 (frame payload), not
+        declared items being read as 0 (without being declared)
+        """
+        with self._lock:
+            return self._store.getBytes(index, count)
+
+    def getRangeValues(self, index, count):
+        """
+        return the values of the items range as an array of 32 bits values (not declared items
+        being read as 0)
+        """
+        return decodeRangePayload(self.getBytes(index, count), count)
+
+    def setValues(self, index, values):
+        """
+        set the values of the items range (frame payload), declaring the missing items. The
+        whole range is refused (nothing written) if one of its items can't be written
+        """
+        if not self.canWriteRange(index, len(values)):
+            return False
+        for n in range(len(values)):
+            self.declare(index+n).value=values[n]
+        return True
+
+    def setMaxPages(self, maxPages=None):
+        """
+        cap the count of pages of the local node memory image (see SAIAPagedImage)
+        """
+        if isinstance(self._store, SAIAImageItemStore):
+            with self._lock:
+                self._store.image.setMaxPages(maxPages)
+
+    def pageStats(self):
+        """
+        return the local node memory image pages usage (None for a remote server)
+        """
+        if isinstance(self._store, SAIAImageItemStore):
+            with self._lock:
+                return self._store.stats()
+
+    def createReadRangeRequest(self):
+        return SAIARequestReadRange(self.server.link, self.COMMAND_READ)
+
+    def createRangeBuffer(self, count):
+        return array(UINT32, [0])*count
 
 
 class SAIARegisters(SAIAAnalogItems):
+    COMMAND_READ = SAIARequest.COMMAND_READ_REGISTERS
+    SECTION = 'registers'
+
     def __init__(self, memory, maxsize=65535):
         super(SAIARegisters, self).__init__(memory, SAIAItemRegister, maxsize)
 
+    def createReadRequest(self):
+        return SAIARequestReadRegisters(self.server.link)
+
+    def createWriteRequest(self):
+        return SAIARequestWriteRegisters(self.server.link)
+
     def resolveIndex(self, key):
         try:
             if isinstance(key, SAIASymbol) and key.isRegister():
@@ -264,12 +552,76 @@ class SAIARegisters(SAIAAnalogItems):
 
 
 class SAIATimers(SAIAAnalogItems):
+    COMMAND_READ = SAIARequest.COMMAND_READ_TIMERS
+
     def __init__(self, memory, maxsize=65535):
-        super(SAIATimers, self).__init__(memory, SAIAItemTimer, maxsize)
         self._tickBaseTime=0.01
+        self._wheel=SAIATimerWheel(0.1)
+        super(SAIATimers, self).__init__(memory, SAIAItemTimer, maxsize)
+
+    def createStore(self):
+        if self.isLocalNodeMode():
+            return SAIATimerItemStore(self._tickBaseTime)
+        return super(SAIATimers, self).createStore()
 
     def setTickBaseTimeMs(self, basetime=100):
-        self._tickBaseTimeMs=basetime/1000.0
+        self._tickBaseTime=basetime/1000.0
+        if self.isLocalNodeMode():
+            with self._lock:
+                self._store.setTickBaseTime(self._tickBaseTime)
+                indexes=list(self._wheel._keys)
+            for index in indexes:
+                self.scheduleTimeout(self.item(index))
+
+    def scheduleTimeout(self, item):
+        """
+        (re)schedule the local timer timeout notification in the timer wheel
+        """
+        with self._lock:
+            deadline=self._store.getDeadline(item._slot)
+            if deadline is None:
+                self._wheel.remove(item.index)
+            else:
+                deadline=self._wheel.add(item.index, deadline)
+        if deadline is not None:
+            self.server.node.wakeupAt(deadline)
+
+    def createReadRequest(self):
+        return SAIARequestReadTimers(self.server.link)
+
+    def createWriteRequest(self):
+        return SAIARequestWriteTimers(self.server.link)
+
+    def manager(self):
+        if not self.isLocalNodeMode():
+            return super(SAIATimers, self).manager()
+
+        # only the expired timers are visited (the running ones are computed on read)
+        activity=False
+        now=time.time()
+        with self._lock:
+            indexes=self._wheel.expire(now)
+        for index in indexes:
+            try:
+                with self._lock:
+                    item=self.proxy(index)
+                    deadline=self._store.getDeadline(item._slot)
+                    if deadline is not None and deadline>now:
+                        # rounding, not yet expired
+                        self.server.node.wakeupAt(self._wheel.add(index, deadline))
+                        continue
+                if deadline is not None:
+                    item.onTimeout()
+                    activity=True
+            except:
+                self.logger.exception('manager()')
+        return activity
+
+    def nextDeadline(self):
+        if not self.isLocalNodeMode():
+            return super(SAIATimers, self).nextDeadline()
+        with self._lock:
+            return self._wheel.nextDeadline()
 
     def resolveIndex(self, key):
         try:
@@ -295,9 +647,18 @@ class SAIATimers(SAIAAnalogItems):
 
 
 class SAIACounters(SAIAAnalogItems):
+    COMMAND_READ = SAIARequest.COMMAND_READ_COUNTERS
+    SECTION = 'counters'
+
     def __init__(self, memory, maxsize=65535):
         super(SAIACounters, self).__init__(memory, SAIAItemCounter, maxsize)
 
+    def createReadRequest(self):
+        return SAIARequestReadCounters(self.server.link)
+
+    def createWriteRequest(self):
+        return SAIARequestWriteCounters(self.server.link)
+
     def resolveIndex(self, key):
         try:
             if isinstance(key, SAIASymbol) and key.isCounter():
@@ -322,11 +683,16 @@ class SAIACounters(SAIAAnalogItems):
 
 
 class SAIAMemory(object):
-    def __init__(self, server, localNodeMode=False, enableOnTheFlyItemCreation=True):
+    def __init__(self, server, localNodeMode=False, enableOnTheFlyItemCreation=True, memoryFile=None):
         assert server.__class__.__name__=='SAIAServer'
         self._server=server
         self._localNodeMode=localNodeMode
         self._enableOnTheFlyItemCreation=enableOnTheFlyItemCreation
+        self._maxOnTheFlyItems=None
+        self._file=None
+        if localNodeMode and memoryFile:
+            self._file=SAIAMemoryFile(memoryFile, self.logger)
+            self.logger.info('local memory mapped to %s' % self._file.path)
         self._inputs=SAIAInputs(self)
         self._outputs=SAIAOutputs(self)
         self._flags=SAIAFlags(self)
@@ -336,6 +702,12 @@ class SAIAMemory(object):
         self._queuePendingPull=SAIAItemQueue()
         self._queuePendingPriorityPull=SAIAItemQueue()
         self._queuePendingPush=SAIAItemQueue()
+        self._writes=deque()
+        self._reads=deque()
+        self._delayWriteCoalescing=0.005
+        self._writeMaxGap=0
+        self._timeoutWriteWindow=0
+        self._flushWrites=False
         self._readOnly=False
 
     @property
@@ -384,8 +756,17 @@ class SAIAMemory(object):
             return True
         return False
 
-    def enableOnTheFlyItemCreation(self, state=True):
+    def enableOnTheFlyItemCreation(self, state=True, maxItems=None):
+        """
+        enable items declaration on access (items[index]), remote writes included for the local
+        node. If given, maxItems caps the count of items of each collection beyond which no more
+        items are declared on the fly
+        """
         self._enableOnTheFlyItemCreation=state
+        self._maxOnTheFlyItems=maxItems
+
+    def getOnTheFlyItemLimit(self):
+        return self._maxOnTheFlyItems
 
     def disableOnTheFlyItemCreation(self):
         self.enableOnTheFlyItemCreation(False)
@@ -398,6 +779,59 @@ class SAIAMemory(object):
     def all(self):
         return (self._inputs, self._outputs, self._flags, self._registers, self._timers, self._counters)
 
+    def snapshot(self, formater=None):
+        """
+        return the state of the declared items as {type: collection snapshot}, see SAIAItems.snapshot().
+        The optional formater is used to decode the registers values
+        """
+        return {'inputs': self._inputs.snapshot(),
+                'outputs': self._outputs.snapshot(),
+                'flags': self._flags.snapshot(),
+                'registers': self._registers.snapshot(formater),
+                'timers': self._timers.snapshot(),
+                'counters': self._counters.snapshot()}
+
+    def setMaxPages(self, maxPages=None):
+        """
+        cap the count of (256 values) pages of the local node registers and counters images
+        """
+        self._registers.setMaxPages(maxPages)
+        self._counters.setMaxPages(maxPages)
+
+    def mappedBuffer(self, section):
+        """
+        return the memory mapped buffer backing the given items type (None if not mapped)
+        """
+        if self._file is not None:
+            return self._file.section(section)
+
+    def isMapped(self):
+        return self._file is not None
+
+    def flush(self):
+        """
+        flush the memory mapped file (if any) to the disk
+        """
+        if self._file is not None:
+            self._file.flush()
+
+    def pageStats(self):
+        """
+        return the local node registers and counters images pages usage as {type: stats}
+        """
+        return {'registers': self._registers.pageStats(),
+                'counters': self._counters.pageStats()}
+
+    def collection(self, key):
+        """
+        return the items collection given by its type letter (I, O, F, R, T, C)
+        """
+        try:
+            return {'I': self._inputs, 'O': self._outputs, 'F': self._flags,
+                'R': self._registers, 'T': self._timers, 'C': self._counters}[key.upper()[0]]
+        except:
+            pass
+
     def items(self):
         return self.all()
 
@@ -414,18 +848,137 @@ class SAIAMemory(object):
             except:
                 pass
 
+    def setWriteCoalescing(self, delay=0.005, maxGap=0):
+        """
+        Pending writes (pushes) are collected during the given delay (s) before being merged
+        into the fewest possible write frames. Holes of up to maxGap items between written items
+        can be bridged if the holes items are declared and alive, rewriting their known value.
+        """
+        self._delayWriteCoalescing=max(0.0, float(delay))
+        self._writeMaxGap=max(0, int(maxGap))
+
     def getNextPendingPush(self):
         try:
-            count=32
-            while count>0:
+            while True:
                 item=self._queuePendingPush.get(False)
                 if item.isPendingPushRequest():
                     item.clearPush()
                     return item
-                count-=1
+                # stale entry (push already done), skipped
         except:
             pass
 
+    def drainPendingPushes(self):
+        """
+        return every pending push as {collection: {index: value}}. The last
+        pushed value of an item is taken (last-write-wins)
+        """
+        pushes={}
+        while True:
+            item=self.getNextPendingPush()
+            if not item:
+                break
+            pushes.setdefault(item.parent, {})[item.index]=(item, item.pushValue)
+        return pushes
+
+    def isBridgeableItem(self, item):
+        if item and not item.isReadOnly() and not item.isPendingPushRequest():
+            if item.isAlive():
+                return True
+        return False
+
+    def planWrites(self, pushes):
+        """
+        merge the drained pushes into consecutive items ranges, returning the
+        corresponding write requests
+        """
+        requests=[]
+        for (items, values) in pushes.items():
+            maxcount=items.FRAME_MAXCOUNT_WRITE
+            run=[]
+            runValues=[]
+            pushed=[]
+            for index in sorted(values.keys()):
+                (item, value)=values[index]
+                if run:
+                    last=run[-1].index
+                    bridge=[]
+                    if index-last-1<=self._writeMaxGap and index-run[0].index<maxcount:
+                        for n in range(last+1, index):
+                            gap=items.item(n)
+                            if not self.isBridgeableItem(gap):
+                                bridge=None
+                                break
+                            bridge.append(gap)
+                    else:
+                        bridge=None
+
+                    if bridge is None:
+                        requests.append(self.createRangeWriteRequest(items, run, runValues, pushed))
+                        run=[]
+                        runValues=[]
+                        pushed=[]
+                    else:
+                        for gap in bridge:
+                            run.append(gap)
+                            runValues.append(gap.value)
+
+                run.append(item)
+                runValues.append(value)
+                pushed.append(item)
+
+            if run:
+                requests.append(self.createRangeWriteRequest(items, run, runValues, pushed))
+        return [request for request in requests if request]
+
+    def createRangeWriteRequest(self, items, run, values, pushed):
+        request=items.createWriteRequest()
+        if request:
+            request.setupRange(run, values, pushed)
+        return request
+
+    def getNextWrite(self):
+        """
+        return the next planned write request. Pending pushes are planned once the
+        coalescing window (started by the first pending push) is elapsed
+        """
+        if not self._writes and not self._queuePendingPush.empty():
+            now=time.time()
+            if not self._timeoutWriteWindow:
+                self._timeoutWriteWindow=now+self._delayWriteCoalescing
+                self.server.node.wakeupAt(self._timeoutWriteWindow)
+            if now>=self._timeoutWriteWindow or self._flushWrites:
+                self._timeoutWriteWindow=0
+                self._flushWrites=False
+                self._writes.extend(self.planWrites(self.drainPendingPushes()))
+
+        if self._writes:
+            return self._writes.popleft()
+
+    def flushWrites(self):
+        """
+        close the write coalescing window, the pending writes being sent before the next reads
+        """
+        self._flushWrites=True
+        self.server.signalReady()
+
+    def submitRead(self, request):
+        """
+        queue a (ready) read request, initiated before the items pulls
+        """
+        if not self._queuePendingPush.empty():
+            # don't read values still waiting in the write coalescing window
+            self.flushWrites()
+        self._reads.append(request)
+        self.server.signalReady()
+
+    def getNextRead(self):
+        while self._reads:
+            request=self._reads.popleft()
+            # skip cancelled requests
+            if not request.isDone():
+                return request
+
     def getNextPendingPull(self):
         count=64
         try:
@@ -452,30 +1005,62 @@ class SAIAMemory(object):
         activity=False
         try:
             for items in self.items():
-                items.manager()
+                if items.manager():
+                    activity=True
         except:
             self.logger.exception('items:manager')
 
-        if self.server.isAlive() and self.server.link.isIdle():
-            item=self.getNextPendingPush()
-            if item:
-                if item.push():
+        # fill the link window (pipelined requests)
+        link=self.server.link
+        while self.server.isAlive() and link.isAvailable():
+            request=self.getNextWrite()
+            if request:
+                if request.initiate():
                     activity=True
                 else:
                     # TODO: requeue ?
                     self.logger.error('push')
+                    break
+                continue
+
+            request=self.getNextRead()
+            if request:
+                if request.initiate():
+                    activity=True
+                else:
+                    self._reads.appendleft(request)
+                    break
             else:
                 item=self.getNextPendingPull()
-                if item:
-                    if item.pull():
-                        activity=True
-                    else:
-                        # TODO: requeue ?
-                        self.logger.error('pull')
+                if not item:
+                    break
+                if item.pull():
+                    activity=True
+                else:
+                    # TODO: requeue ?
+                    self.logger.error('pull')
+                    break
 
         if activity:
             return True
 
+    def nextDeadline(self):
+        """
+        return the time at which the items manager should be called again
+        """
+        if self.server.isAlive() and self.server.link.isAvailable():
+            if self._writes or self._reads or not (self._queuePendingPull.empty() and self._queuePendingPriorityPull.empty()):
+                return time.time()
+            if not self._queuePendingPush.empty():
+                if self._flushWrites:
+                    return time.time()
+                return self._timeoutWriteWindow or time.time()
+
+        deadlines=[items.nextDeadline() for items in self.items()]
+        deadlines=[stamp for stamp in deadlines if stamp is not None]
+        if deadlines:
+            return min(deadlines)
+
     def dump(self):
         for items in self.items():
             if items:
@@ -488,10 +1073,25 @@ class SAIAMemory(object):
                 items.table(key)
 
     def isPendingPushRequest(self):
-        if not self._queuePendingPush.empty():
+        if self._writes or not self._queuePendingPush.empty():
             return True
         return False
 
+    def queues(self):
+        return {'pull': self._queuePendingPull,
+                'priorityPull': self._queuePendingPriorityPull,
+                'push': self._queuePendingPush}
+
+    def queuesDepth(self):
+        """
+        return the current number of queued items per pending queue
+        """
+        return {name: queue.count() for (name, queue) in self.queues().items()}
+
+    def resetQueuesCounters(self):
+        for queue in self.queues().values():
+            queue.resetCounters()
+
     def __repr__(self):
         return '<%s(%d items, queues %dR:%dR!:%dW)>' % (self.__class__.__name__,
             self.count(),
@@ -15,6 +15,7 @@ import logging.handlers
 from digimat.jobs import JobManager
 
 from .singleton import Singleton
+from .engine import SAIANodeEngine
 
 from .server import SAIAServer
 from .server import SAIASBusCRC
@@ -38,8 +39,6 @@ from .response import SAIAResponseNAK
 
 from .items import SAIAItemGroup
 
-from .ModbusDataLib import bin2boollist
-
 
 # NOTICE
 # ------
@@ -218,11 +217,11 @@ class SAIAHandler_WRITE_OUTPUTS(SAIANodeRequestHandler):
         if not self.node.memory.isReadOnly():
             items=self.node.memory.outputs
             (bytecount, address, fiocount)=struct.unpack('>BHB', data[0:4])
-            if address>=0 and fiocount<=32:
-                values=bin2boollist(data[4:])
-                for n in range(fiocount+1):
-                    items[address+n].value=values[n]
-                return self.ack()
+            # the whole frame is refused (nothing written) if one of its bits can't be stored
+            if address>=0 and fiocount<=32 and len(data)>=4+(fiocount+8)//8:
+                if items.canWriteRange(address, fiocount+1):
+                    items.setBytes(address, fiocount+1, data[4:4+(fiocount+8)//8])
+                    return self.ack()
 
 
 class SAIAHandler_WRITE_FLAGS(SAIANodeRequestHandler):
@@ -232,11 +231,11 @@ class SAIAHandler_WRITE_FLAGS(SAIANodeRequestHandler):
         if not self.node.memory.isReadOnly():
             items=self.node.memory.flags
             (bytecount, address, fiocount)=struct.unpack('>BHB', data[0:4])
-            if address>=0 and fiocount<=32:
-                values=bin2boollist(data[4:])
-                for n in range(fiocount+1):
-                    items[address+n].value=values[n]
-                return self.ack()
+            # the whole frame is refused (nothing written) if one of its bits can't be stored
+            if address>=0 and fiocount<=32 and len(data)>=4+(fiocount+8)//8:
+                if items.canWriteRange(address, fiocount+1):
+                    items.setBytes(address, fiocount+1, data[4:4+(fiocount+8)//8])
+                    return self.ack()
 
 
 class SAIAHandler_WRITE_REGISTERS(SAIANodeRequestHandler):
@@ -249,9 +248,8 @@ class SAIAHandler_WRITE_REGISTERS(SAIANodeRequestHandler):
             if address>=0:
                 # count=bytecount-1
                 values=self.bin2dwordlist(data[3:])
-                for n in range(len(values)):
-                    items[address+n].value=values[n]
-                return self.ack()
+                if items.setValues(address, values):
+                    return self.ack()
 
 
 class SAIAHandler_WRITE_TIMERS(SAIANodeRequestHandler):
@@ -264,9 +262,8 @@ class SAIAHandler_WRITE_TIMERS(SAIANodeRequestHandler):
             if address>=0:
                 # count=bytecount-1
                 values=self.bin2dwordlist(data[3:])
-                for n in range(len(values)):
-                    items[address+n].value=values[n]
-                return self.ack()
+                if items.setValues(address, values):
+                    return self.ack()
 
 
 class SAIAHandler_WRITE_COUNTERS(SAIANodeRequestHandler):
@@ -279,9 +276,8 @@ class SAIAHandler_WRITE_COUNTERS(SAIANodeRequestHandler):
             if address>=0:
                 # count=bytecount-1
                 values=self.bin2dwordlist(data[3:])
-                for n in range(len(values)):
-                    items[address+n].value=values[n]
-                return self.ack()
+                if items.setValues(address, values):
+                    return self.ack()
 
 
 class SAIAHandler_CLEAR_OUTPUTS(SAIANodeRequestHandler):
@@ -434,16 +430,28 @@ class SAIALogger(object):
 
 
 class SAIANode(object):
-    def __init__(self, lid=253, port=SAIAServer.UDP_DEFAULT_PORT, logger=None, autostart=True, scanner=None, broadcastAddress='255.255.255.255', debug=False):
+    ENGINE_JOBS = 'jobs'
+    ENGINE_ASYNCIO = 'asyncio'
+
+    def __init__(self, lid=253, port=SAIAServer.UDP_DEFAULT_PORT, logger=None, autostart=True, scanner=None, broadcastAddress='255.255.255.255', debug=False,
+            engine=None, loop=None, memoryFile=None):
         self._socket=None
         self._lid=int(lid)
         self._debug=debug
+        self._jobs=None
+        self._jobSAIA=None
+        self._engine=None
+        self._engineType=engine or self.ENGINE_JOBS
+        if loop is not None:
+            # giving an event loop implies the asyncio engine
+            self._engineType=self.ENGINE_ASYNCIO
+        self._loop=loop
 
         if logger is None:
             logger=SAIALogger().tcp()
 
         self._logger=logger
-        self._localServer=SAIAServer(self, 'localnode', self._lid, localNodeMode=True)
+        self._localServer=SAIAServer(self, 'localnode', self._lid, localNodeMode=True, memoryFile=memoryFile)
         self.logger.info('localServer(%d) registered' % self._lid)
         if scanner is None and self.isInteractiveMode():
             scanner=True
@@ -544,6 +552,34 @@ class SAIANode(object):
     def jobs(self):
         return self._jobs
 
+    @property
+    def engine(self):
+        return self._engine
+
+    def isEventDriven(self):
+        """
+        True if the node is managed by the asyncio engine (no polling)
+        """
+        if self._engineType==self.ENGINE_ASYNCIO:
+            return True
+        return False
+
+    def wakeup(self):
+        """
+        Ask for a manager pass as soon as possible. Useless (ignored) with
+        the polling (jobs) engine
+        """
+        if self._engine:
+            self._engine.wakeup()
+
+    def wakeupAt(self, stamp):
+        """
+        Ask for a manager pass at the given time (time.time() based stamp)
+        Useless (ignored) with the polling (jobs) engine
+        """
+        if self._engine:
+            self._engine.wakeupAt(stamp)
+
     def __getitem__(self, key):
         return self.servers[key]
 
@@ -634,11 +670,20 @@ class SAIANode(object):
 
     def sendMessageToHost(self, data, host, port=None):
         try:
-            s=self.open()
+            if self.isEventDriven():
+                # the socket is owned (opened, reopened and read) by the engine only
+                s=None
+                if self._engine and self._engine.isOpen():
+                    s=self._engine
+            else:
+                s=self.open()
             if s:
                 if port is None:
                     port=self._port
-                size=s.sendto(data, (host, port))
+                if self._engine:
+                    size=self._engine.sendto(data, (host, port))
+                else:
+                    size=s.sendto(data, (host, port))
                 if self._debug:
                     self.logger.debug('-->%s:%d %s' % (host, port, self.data2strhex(data)))
                 if size==len(data):
@@ -684,40 +729,46 @@ class SAIANode(object):
             s=self.open()
             (data, address)=s.recvfrom(4096)
             if data:
-                host=address[0]
-                port=address[1]
-                (mtype, mseq, payload)=self.decodeMessage(data)
-                if self._debug:
-                    self.logger.debug('<--%s:%d seq=%d mtype=%d %s' % (host, port, mseq, mtype, self.data2strhex(data)))
+                return self.processMessage(data, address)
+        except:
+            pass
 
-                # 0=REQUEST
-                if mtype==0:
+    def processMessage(self, data, address):
+        try:
+            host=address[0]
+            port=address[1]
+            (mtype, mseq, payload)=self.decodeMessage(data)
+            if self._debug:
+                self.logger.debug('<--%s:%d seq=%d mtype=%d %s' % (host, port, mseq, mtype, self.data2strhex(data)))
+
+            # 0=REQUEST
+            if mtype==0:
+                try:
+                    response=self.onRequest(mseq, payload)
+                    if response:
+                        data=response.data
+                        if data is not None:
+                            self.sendMessageToHost(response.data, host, port)
+                        else:
+                            response=SAIAResponseNAK(self, mseq)
+                            self.sendMessageToHost(response.data, host, port)
+                except:
+                    self.logger.exception('request')
+            else:
+                server=self.servers.getFromHost(address[0])
+                if server:
                     try:
-                        response=self.onRequest(mseq, payload)
-                        if response:
-                            data=response.data
-                            if data is not None:
-                                self.sendMessageToHost(response.data, host, port)
-                            else:
-                                response=SAIAResponseNAK(self, mseq)
-                                self.sendMessageToHost(response.data, host, port)
+                        server.onMessage(mtype, mseq, payload)
                     except:
-                        self.logger.exception('request')
+                        self.logger.exception('onMessage()')
                 else:
-                    server=self.servers.getFromHost(address[0])
-                    if server:
-                        try:
-                            server.onMessage(mtype, mseq, payload)
-                        except:
-                            self.logger.exception('onMessage()')
-                    else:
-                        if not self.isIpAddressLocal(address[0]):
-                            self.logger.warning('Message received from an undeclared server %s!' % address[0])
-                            if self.isInteractiveMode():
-                                # TODO: lock!
-                                self.servers.declare(address[0])
+                    if not self.isIpAddressLocal(address[0]):
+                        self.logger.warning('Message received from an undeclared server %s!' % address[0])
+                        if self.isInteractiveMode():
+                            # TODO: lock!
+                            self.servers.declare(address[0])
 
-                return True
+            return True
         except:
             pass
 
@@ -752,15 +803,29 @@ class SAIANode(object):
 
         return False
 
+    def process(self):
+        """
+        Event driven manager pass (asyncio engine), messages being dispatched
+        by the engine itself as soon as they are received
+        """
+        activity=False
+        if self.servers.manager():
+            activity=True
+        if self.server.manager():
+            activity=True
+        return activity
+
     def refresh(self):
         self.servers.refresh()
 
     def start(self):
-        try:
-            if self._jobs:
-                return
-        except:
-            pass
+        if self._jobs or self._engine:
+            return
+
+        if self.isEventDriven():
+            self._engine=SAIANodeEngine(self, self._loop)
+            self._engine.start()
+            return
 
         self._jobs=JobManager(self.logger)
         self._jobSAIA=self._jobs.addJobFromFunction(self.manager)
@@ -768,6 +833,13 @@ class SAIANode(object):
         self._jobs.start()
 
     def stop(self):
+        try:
+            if self._engine:
+                self._engine.stop()
+        except:
+            pass
+        self._engine=None
+
         try:
             self._jobs.stop()
         except:
@@ -775,14 +847,25 @@ class SAIANode(object):
         self._jobSAIA=None
         self._jobs=None
 
+        try:
+            self._localServer.memory.flush()
+        except:
+            pass
+
     def isRunning(self):
         try:
+            if self._engine:
+                return self._engine.isRunning()
             return self._jobSAIA.isRunning()
         except:
             pass
         return False
 
     def sleep(self, delay=1.0):
+        if self._engine:
+            time.sleep(delay)
+            return
+
         try:
             self._jobSAIA.sleep(delay)
         except:
@@ -792,6 +875,16 @@ class SAIANode(object):
     def __del__(self):
         self.stop()
 
+    def snapshot(self, local=False, formater=None):
+        """
+        return the memory snapshot of every remote server as {host: snapshot}, including the local
+        node memory (key 'local') if requested. See SAIAItems.snapshot()
+        """
+        snapshot=self.servers.snapshot(formater)
+        if local:
+            snapshot['local']=self.server.snapshot(formater)
+        return snapshot
+
     def dump(self):
         self.server.dump()
         self.servers.dump()
@@ -0,0 +1,303 @@
+from __future__ import division
+
+import time
+import random
+
+from bisect import bisect_left
+from bisect import bisect_right
+
+
+class SAIAReadBlock(object):
+    """
+    Range of declared items read by a single frame. The block is refreshed as a
+    unit, with one shared deadline for all its items
+    """
+
+    def __init__(self, plan, index, count):
+        self._plan=plan
+        self._index=index
+        self._count=count
+        self._due=None
+        self._pending=False
+        self._inhibitTimeout=0
+        self._inhibitDelay=0
+        self._changed=False
+        self._delayAdaptive=None
+
+    @property
+    def plan(self):
+        return self._plan
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def count(self):
+        return self._count
+
+    def contains(self, index):
+        if index>=self._index and index<self._index+self._count:
+            return True
+        return False
+
+    def items(self):
+        return self.plan.itemsInRange(self._index, self._count)
+
+    def age(self):
+        """
+        return the age of the oldest item value in the block
+        """
+        stamp=self.plan.oldestStampInRange(self._index, self._count)
+        if stamp is None:
+            return 0
+        return max(0, time.time()-stamp)
+
+    def getRefreshDelay(self):
+        if self._delayAdaptive is not None:
+            return self._delayAdaptive
+        delay=self.plan.refreshDelayInRange(self._index, self._count)
+        if delay is None:
+            return 60
+        return delay
+
+    def signalPull(self, urgent=False):
+        item=self.plan.collection.item(self._index)
+        if item:
+            self._pending=True
+            item.signalPull(urgent)
+
+    def adapt(self):
+        """
+        adaptive refresh mode : update the block refresh delay from the values changes
+        seen since the previous refresh (faster if changed, slower if stable)
+        """
+        bounds=self.plan.collection.getAdaptiveRefresh()
+        if bounds is None:
+            self._delayAdaptive=None
+        else:
+            (minDelay, maxDelay)=bounds
+            delay=self._delayAdaptive
+            if delay is None:
+                delay=self.plan.collection.getRefreshDelay()
+            elif self._changed:
+                delay*=0.5
+            else:
+                delay*=1.5
+            self._delayAdaptive=min(max(delay, minDelay), maxDelay)
+        self._changed=False
+
+    def onUpdate(self):
+        # a value has been received for (at least) one of the block items
+        self._pending=False
+        self._inhibitDelay=0
+
+    def manager(self):
+        """
+        called by the items scheduler when the block is due, returning the time
+        at which the block has to be checked again
+        """
+        now=time.time()
+        age=self.age()
+        delay=self.getRefreshDelay()
+        if age>=delay:
+            if age<max(180, 2*delay):
+                if not self._pending:
+                    # new refresh cycle
+                    self.adapt()
+                self.signalPull()
+                # retry if no value is received in the meantime
+                return now+min(delay, 5.0)
+
+            # special case for non responsive items, avoiding
+            # permanent retries (exponential backoff, with jitter)
+            if now>=self._inhibitTimeout:
+                self.signalPull()
+                self._inhibitDelay=min(max(10.0, self._inhibitDelay*2), 600.0)
+                self._inhibitTimeout=now+self._inhibitDelay*random.uniform(0.75, 1.25)
+            return self._inhibitTimeout
+        return now+delay-age
+
+    def __repr__(self):
+        return '<%s(index=%d, count=%d)>' % (self.__class__.__name__, self._index, self._count)
+
+
+class SAIAReadPlan(object):
+    """
+    Items collection read plan. Declared indexes are merged into frame sized blocks (maxcount)
+    by a greedy left to right packing. A hole (not declared indexes) is read within the block
+    if its cost (size*holeCost) is not greater than the cost of an additional frame (frameCost).
+    The plan is incrementally updated when new items are declared : the packing is redone from
+    the block covering the new index, until a block start matches the previous plan again.
+    """
+
+    def __init__(self, collection, maxcount, holeCost=1.0, frameCost=None):
+        self._collection=collection
+        self._maxcount=maxcount
+        self._holeCost=holeCost
+        self._frameCost=frameCost
+        self._blocks=[]
+        self._starts=[]
+
+    @property
+    def _indexes(self):
+        # the declared indexes (sorted), shared with the collection store
+        return self._collection.store.indexes()
+
+    @property
+    def collection(self):
+        return self._collection
+
+    @property
+    def maxcount(self):
+        return self._maxcount
+
+    def getFrameCost(self):
+        if self._frameCost is None:
+            # default: any hole fitting in a frame is read
+            return self._maxcount
+        return self._frameCost
+
+    def setHoleCost(self, holeCost, frameCost=None):
+        """
+        Change the cost model and rebuild the whole plan. Return the (replaced, created) blocks
+        """
+        self._holeCost=max(0.0, float(holeCost))
+        self._frameCost=frameCost
+        replaced=self._blocks
+        self._blocks=[]
+        self._starts=[]
+        created=self.pack(0)
+        self._blocks=created
+        self._starts=[block.index for block in created]
+        return (replaced, created)
+
+    def blocks(self):
+        return self._blocks
+
+    def count(self):
+        return len(self._blocks)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+    def block(self, index):
+        """
+        return the block covering the given index (or None)
+        """
+        n=bisect_right(self._starts, index)-1
+        if n>=0:
+            block=self._blocks[n]
+            if block.contains(index):
+                return block
+
+    def oldestStampInRange(self, index, count):
+        """
+        return the oldest value stamp of the declared items in range (or None), read
+        from the store stamps column
+        """
+        store=self._collection.store
+        with self._collection._lock:
+            return store.getOldestStamp(index, count)
+
+    def refreshDelayInRange(self, index, count):
+        """
+        return the shortest refresh delay of the declared items in range (or None). Only the
+        pinned items may have their own delay, no item proxy is created
+        """
+        collection=self._collection
+        with collection._lock:
+            indexes=self._indexes
+            n0=bisect_left(indexes, index)
+            n1=bisect_left(indexes, index+count)
+            if n0>=n1:
+                return None
+            delay=collection.getRefreshDelay()
+            pinned=collection._pinned
+            if pinned:
+                for n in range(n0, n1):
+                    item=pinned.get(indexes[n])
+                    if item is not None and item._delayRefresh is not None:
+                        if delay is None or item._delayRefresh<delay:
+                            delay=item._delayRefresh
+            return delay
+
+    def itemsInRange(self, index, count):
+        items=[]
+        n=bisect_left(self._indexes, index)
+        while n<len(self._indexes) and self._indexes[n]<index+count:
+            item=self._collection.item(self._indexes[n])
+            if item:
+                items.append(item)
+            n+=1
+        return items
+
+    def packBlock(self, n):
+        """
+        return a new block starting at self._indexes[n] and the position of the first
+        index not covered by the block
+        """
+        indexes=self._indexes
+        index0=indexes[n]
+        last=index0
+        maxHoleCost=self.getFrameCost()
+        n+=1
+        while n<len(indexes):
+            index=indexes[n]
+            if index-index0>=self._maxcount:
+                break
+            if (index-last-1)*self._holeCost>maxHoleCost:
+                break
+            last=index
+            n+=1
+        return (SAIAReadBlock(self, index0, last-index0+1), n)
+
+    def pack(self, n):
+        """
+        pack indexes starting at position n
+        """
+        blocks=[]
+        while n<len(self._indexes):
+            (block, n)=self.packBlock(n)
+            blocks.append(block)
+        return blocks
+
+    def add(self, index):
+        """
+        update the plan with a just declared index (already added to the collection
+        store), returning the (replaced, created) blocks
+        """
+        n=bisect_left(self._indexes, index)
+        b=max(0, bisect_right(self._starts, index)-1)
+        if self._blocks:
+            n=bisect_left(self._indexes, min(index, self._starts[b]))
+
+        created=[]
+        e=b
+        while n<len(self._indexes):
+            start=self._indexes[n]
+            while e<len(self._blocks) and self._starts[e]<start:
+                e+=1
+            if e<len(self._blocks) and self._starts[e]==start and start>index:
+                # from here, the packing is the same as the previous plan
+                break
+            (block, n)=self.packBlock(n)
+            created.append(block)
+        else:
+            e=len(self._blocks)
+
+        replaced=self._blocks[b:e]
+        self._blocks[b:e]=created
+        self._starts[b:e]=[block.index for block in created]
+        return (replaced, created)
+
+    def __repr__(self):
+        return '<%s(%d indexes, %d blocks, maxcount=%d, holeCost=%.01f)>' % (self.__class__.__name__,
+            len(self._indexes), len(self._blocks), self._maxcount, self._holeCost)
+
+
+if __name__ == "__main__":
+    pass
@@ -2,12 +2,21 @@ from __future__ import print_function  # Python 2/3 compatibility
 from __future__ import division
 
 import struct
+import binascii
+import sys
 import time
+from array import array
 from functools import reduce
 from builtins import bytes
 
-from .ModbusDataLib import bin2boollist
-from .ModbusDataLib import boollist2bin
+from .bitset import packbools
+from .bitset import unpackbools
+from .bitset import unpackboolbytes
+from .bitset import bin2bits
+from .store import SAIAItemStore
+
+# array typecode of 32 bits unsigned values
+UINT32 = 'I' if array('I').itemsize==4 else 'L'
 
 # This is the precalculated hash table for CCITT V.41.
 SAIASBusCRCTable = [
@@ -62,11 +71,8 @@ def SAIASBusCRC_old(data):
 
 
 def SAIASBusCRC(data):
-    crc=0
-    # using bytes() for Python2/3 compatibility
-    for b in bytes(data):
-        crc=SAIASBusCRCTable[((crc >> 8) ^ b) & 0xFF] ^ ((crc << 8) & 0xFFFF)
-    return crc
+    # CRC-CCITT (XModem), as computed by the table above, provided by binascii
+    return binascii.crc_hqx(data, 0)
 
 
 def SAIASBusCRCTableCheck():
@@ -128,6 +134,11 @@ class SAIARequest(object):
         self._done=False
         self._result=False
         self._sequence=0
+        # link side state (pending/waiting response) and response timeout
+        self._linkState=0
+        self._timeout=0
+        self._xmitCount=0
+        self._doneCallbacks=None
         self.onInit()
         SAIASBusCRCTableCheck()
 
@@ -263,9 +274,15 @@ class SAIARequest(object):
     def consumeRetry(self):
         if self._retry>0:
             self._retry-=1
+            self._xmitCount+=1
             self._stamp=time.time()
             return True
 
+    def isRetransmitted(self):
+        if self._xmitCount>1:
+            return True
+        return False
+
     def validateMessage(self, sequence, payload=None):
         if self.isReady():
             if sequence==self._sequence:
@@ -281,11 +298,29 @@ class SAIARequest(object):
     def onFailure(self):
         self.logger.error('%s<--%s:ERROR' % (self.server.host, self.__class__.__name__))
 
+    def addDoneCallback(self, callback):
+        """
+        register a callback(request, success) called when the request is terminated
+        """
+        if self._doneCallbacks is None:
+            self._doneCallbacks=[]
+        self._doneCallbacks.append(callback)
+
     def start(self):
         self._start=True
         self._done=False
         self._result=False
 
+    def cancel(self):
+        """
+        cancel a not yet initiated request
+        """
+        if not self._start and not self._done:
+            self._done=True
+            self._result=False
+            return True
+        return False
+
     def stop(self, success):
         self._done=True
         try:
@@ -296,6 +331,12 @@ class SAIARequest(object):
                 self.onFailure()
         except:
             pass
+        if self._doneCallbacks:
+            for callback in self._doneCallbacks:
+                try:
+                    callback(self, self._result)
+                except:
+                    self.logger.exception('%s:doneCallback()' % self.__class__.__name__)
 
     def data2uint32list(self, data):
         return list(struct.unpack('>%dI' % (len(data) // 4), data))
@@ -409,7 +450,21 @@ class SAIARequestReadDBX(SAIARequest):
 class SAIARequestReadItems(SAIARequest):
     def setup(self, item, maxcount=1, holes=False):
         self._item=item
-        self._count=self.optimizePullCount(maxcount, holes)
+        # use the (precomputed) read plan block covering the item if any
+        block=item.parent.readBlock(item.index)
+        if holes and block and block.count<=maxcount:
+            self._item=item.parent.item(block.index)
+            self._count=block.count
+        else:
+            self._count=self.optimizePullCount(maxcount, holes)
+        self.ready()
+
+    def setupRange(self, item, count):
+        """
+        setup the request to read count items, starting with the given (declared) item
+        """
+        self._item=item
+        self._count=count
         self.ready()
 
     @property
@@ -458,10 +513,23 @@ class SAIARequestReadItems(SAIARequest):
     def extractValuesFromPayload(self, payload):
         return None
 
+    def start(self):
+        super(SAIARequestReadItems, self).start()
+        # covered items are now in flight : don't let them initiate overlapping
+        # requests while this one is pending (pipelined link)
+        index0=self.item.index
+        items=self.items()
+        for n in range(self._count):
+            item=items.item(index0+n)
+            if item:
+                item.clearPull()
+
     def processResponse(self, payload):
         index0=self.item.index
         count=self._count
         values=self.extractValuesFromPayload(payload)
+        if values is None:
+            return False
 
         items=self.items()
 
@@ -480,6 +548,90 @@ class SAIARequestReadItems(SAIARequest):
             self.sequence, self.item.index, self._count)
 
 
+def decodeRangePayload(payload, count, boolean=False):
+    """
+    decode the count values of a range payload (big-endian UINT32, or packed booleans) as an
+    array of 32 bits values, or as 0/1 bytes for booleans
+    """
+    if boolean:
+        return unpackboolbytes(payload, count)
+    values=array(UINT32)
+    values.frombytes(payload[:4*count])
+    if sys.byteorder=='little':
+        values.byteswap()
+    return values
+
+
+def copyRangeValues(out, offset, values):
+    """
+    copy the decoded range values into out[offset:offset+len(values)]
+    """
+    count=len(values)
+    try:
+        out[offset:offset+count]=values
+    except (TypeError, ValueError):
+        # buffer of another type (i.e. list or array('L'))
+        out[offset:offset+count]=list(values)
+
+
+class SAIARequestReadRange(SAIARequest):
+    """
+    Raw read of a range of items, without any item object involved. Values are decoded
+    from the payload (as 32 bits values or as 0/1 bytes for boolean items) and copied into
+    the given buffer (out[offset:offset+count])
+    """
+
+    def __init__(self, link, command, boolean=False):
+        super(SAIARequestReadRange, self).__init__(link)
+        self._command=command
+        self._boolean=boolean
+
+    def setup(self, index, count, out, offset=0):
+        self._index=index
+        self._count=count
+        self._out=out
+        self._offset=offset
+        self.ready()
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def offset(self):
+        return self._offset
+
+    def encode(self):
+        return struct.pack('>BH', self._count-1, self._index)
+
+    def detach(self):
+        """
+        release the out buffer, a late response being then ignored (i.e. range read timeout)
+        """
+        self._out=None
+
+    def decodePayload(self, payload):
+        return decodeRangePayload(payload, self._count, self._boolean)
+
+    def processResponse(self, payload):
+        values=self.decodePayload(payload)
+        if len(values)<self._count:
+            return False
+        out=self._out
+        if out is None:
+            return False
+        copyRangeValues(out, self._offset, values)
+        return True
+
+    def __repr__(self):
+        return '%s(mseq=%d, command=0x%02X, index=%d, count=%d)' % (self.__class__.__name__,
+            self.sequence, self._command, self._index, self._count)
+
+
 class SAIARequestReadAnalogItems(SAIARequestReadItems):
     def extractValuesFromPayload(self, payload):
         return self.data2uint32list(payload)
@@ -502,7 +654,13 @@ class SAIARequestReadCounters(SAIARequestReadAnalogItems):
 
 class SAIARequestReadBooleanItems(SAIARequestReadItems):
     def extractValuesFromPayload(self, payload):
-        return bin2boollist(payload)
+        return unpackbools(payload, self._count)
+
+    def processResponse(self, payload):
+        # the whole frame is decoded at once in the collection bitset
+        self.items().setBits(self.item.index, self._count, bin2bits(payload),
+            force=True, clear=SAIAItemStore.FLAG_PULL)
+        return True
 
 
 class SAIARequestReadFlags(SAIARequestReadBooleanItems):
@@ -524,13 +682,29 @@ class SAIARequestWriteItems(SAIARequest):
     def setup(self, item, maxcount=1):
         self._item=item
 
+        items=[item]
         values=[item.pushValue]
         while len(values)<maxcount:
             item=item.next()
             if not item or not item.isPendingPushRequest():
                 break
+            item.clearPush()
+            items.append(item)
             values.append(item.pushValue)
 
+        self._items=items
+        self._itemsPushed=items
+        self._values=self.safeMakeArray(values)
+        self.ready()
+
+    def setupRange(self, items, values, pushed=None):
+        """
+        setup the request with a (write planner) range of consecutive items and their values.
+        pushed is the list of items actually pushed (excluding the bridged holes items)
+        """
+        self._item=items[0]
+        self._items=items
+        self._itemsPushed=pushed or items
         self._values=self.safeMakeArray(values)
         self.ready()
 
@@ -542,29 +716,32 @@ class SAIARequestWriteItems(SAIARequest):
         return self.item.parent
 
     def refreshItems(self):
-        try:
-            items=self.items()
-            index0=self.item.index
-            for n in range(len(self._values)):
-                item=items[index0+n]
-                item.clearPush()
-                if item:
-                    item.refresh(urgent=True)
-        except:
-            pass
+        for item in self._items:
+            try:
+                item.refresh(urgent=True)
+            except:
+                pass
+
+    def notifyItems(self, success):
+        for item in self._itemsPushed:
+            try:
+                item.onPushDone(success)
+            except:
+                pass
 
     def onSuccess(self):
         # after push (write oending value), we need a refresh to update the actual value
         self.refreshItems()
+        self.notifyItems(True)
+
+    def onFailure(self):
+        super(SAIARequestWriteItems, self).onFailure()
+        self.notifyItems(False)
 
 
 class SAIARequestWriteBooleanItems(SAIARequestWriteItems):
     def encode(self):
-        data=boollist2bin(self._values)
-
-        # TODO: not ideal, but fix the problem for python2->3 conversion
-        # as when need bytes instead of str
-        data=struct.pack('%dB' % len(data), *[ord(c) for c in data])
+        data=packbools(self._values)
 
         # bytecount = number item to write (as msg length + 2)
         bytecount=len(data)+2
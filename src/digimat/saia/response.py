@@ -2,13 +2,15 @@ from __future__ import print_function  # Python 2/3 compatibility
 
 import struct
 
-from .ModbusDataLib import boollist2bin
-
 from .request import SAIASBusCRC
 
 SAIA_CPU_TYPE = 'xxDIG'
 SAIA_FW_VERSION = '001'
 
+# frame header (length, protocol version, protocol type, sequence, frame type) and footer (crc)
+FRAME_HEADER = struct.Struct('>LBBHB')
+FRAME_CRC = struct.Struct('>H')
+
 
 class SAIAReply(object):
 
@@ -60,15 +62,8 @@ class SAIAReply(object):
         # [data]
         # crc
 
-        sizePayload=len(payload)
-        fformat='>L BBHB %ds' % sizePayload
-        fsize=11+sizePayload
-        frame=struct.pack(fformat,
-            fsize,
-            0, 0, self._sequence, self._replyType,
-            payload)
-
-        return struct.pack('>%ds H' % len(frame), frame, SAIASBusCRC(frame))
+        frame=FRAME_HEADER.pack(11+len(payload), 0, 0, self._sequence, self._replyType)+payload
+        return frame+FRAME_CRC.pack(SAIASBusCRC(frame))
 
     def encode(self):
         """
@@ -165,18 +160,8 @@ class SAIAResponseReadBooleanItem(SAIAReply):
             self.ready()
 
     def encode(self):
-        values=[]
-
-        for n in range(self._count):
-            values.append(self._items[self._address+n].value)
-
-        data=boollist2bin(values)
-
-        # TODO: not ideal, but fix zthe problem for python2->3 conversion
-        # as when need bytes instead of str
-        data=struct.pack('%dB' % len(data), *[ord(c) for c in data])
-
-        return struct.pack('>%ds' % len(data), data)
+        # packed straight from the collection bitset
+        return self._items.getBytes(self._address, self._count)
 
 
 class SAIAResponseReadFlags(SAIAResponseReadBooleanItem):
@@ -208,13 +193,8 @@ class SAIAResponseReadAnalogItem(SAIAReply):
         return struct.pack('>%dL' % len(dwordlist), *dwordlist)
 
     def encode(self):
-        values=[]
-
-        for n in range(self._count):
-            values.append(self._items[self._address+n].value)
-
-        data=self.dwordlist2bin(values)
-        return struct.pack('>%ds' % len(data), data)
+        # sliced from the collection (local memory image)
+        return self._items.getBytes(self._address, self._count)
 
 
 class SAIAResponseReadRegisters(SAIAResponseReadAnalogItem):
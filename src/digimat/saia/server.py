@@ -2,12 +2,16 @@ from __future__ import print_function  # Python 2/3 compatibility
 
 import time
 import struct
+import random
+import heapq
+from collections import deque
 import ipaddress
 from datetime import datetime
 import re
 import unicodedata
 
 from threading import RLock
+from threading import Lock
 
 from .request import SAIARequest
 from .request import SAIARequestReadStationNumber
@@ -20,6 +24,7 @@ from .transfer import SAIATransferQueue
 from .transfer import SAIATransferReadDeviceInformation
 from .transfer import SAIATransferDiscoverNodes
 from .transfer import SAIATransferFromRequest
+from .transfer import SAIARangeRead
 
 from .request import SAIASBusCRC
 from .memory import SAIAMemory
@@ -29,6 +34,16 @@ from .items import SAIAItemGroup
 
 
 class SAIALink(object):
+    """
+    Request/response link with a remote server. Up to .window requests can be pending
+    (sent and waiting for their response) at the same time, each one being identified
+    by its message sequence number, and having its own timeout and retries. The default
+    window of 1 gives the historical stop-and-wait behavior, supported by every PCD.
+
+    The response timeout is derived from the measured round trip time (smoothed rtt
+    and rtt variance, Jacobson/Karels), bounded by [min, max], and doubled on each
+    retransmission of the same request. Retransmitted requests are not sampled (Karn).
+    """
 
     COMMSTATE_IDLE = 0
     COMMSTATE_PENDINGREQUEST = 1
@@ -36,19 +51,23 @@ class SAIALink(object):
     COMMSTATE_ERROR = 10
     COMMSTATE_SUCCESS = 11
 
-    def __init__(self, server, delayXmitInhibit=0):
+    def __init__(self, server, delayXmitInhibit=0, window=1):
         assert server.__class__.__name__=='SAIAServer'
         self._server=server
-        self._request=None
-        self._state=self.COMMSTATE_IDLE
-        self._timeout=0
+        self._requests={}
+        self._window=1
+        self._delayResponseTimeoutMin=0.05
+        self._delayResponseTimeoutMax=3.0
+        self._srtt=None
+        self._rttvar=None
+        self._rto=self._delayResponseTimeoutMax
         self._timeoutXmitInhibit=0
         self._delayXmitInhibit=delayXmitInhibit
         self._timeoutWatchdog=time.time()+60
         self._alive=False
-        self._retry=0
         self._msgseq=0
         self._msgcount=0
+        self.setWindow(window)
         self.reset()
 
     @property
@@ -63,14 +82,79 @@ class SAIALink(object):
         return self.server.logger
 
     def generateMsgSeq(self):
-        self._msgseq+=1
-        if self._msgseq>65535:
-            self._msgseq=1
-        return self._msgseq
+        while True:
+            self._msgseq+=1
+            if self._msgseq>65535:
+                self._msgseq=1
+            # never reuse the sequence of a pending request
+            if self._msgseq not in self._requests:
+                return self._msgseq
+
+    def setWindow(self, window):
+        """
+        Set the maximum number of simultaneous pending requests (pipelining).
+        Some PCDs firmwares don't support more than 1 (default)
+        """
+        try:
+            self._window=min(max(1, int(window)), 64)
+        except:
+            self._window=1
+
+    def getWindow(self):
+        return self._window
+
+    @property
+    def window(self):
+        return self._window
+
+    def setResponseTimeoutBounds(self, delayMin=0.05, delayMax=3.0):
+        self._delayResponseTimeoutMin=max(0.01, float(delayMin))
+        self._delayResponseTimeoutMax=max(self._delayResponseTimeoutMin, float(delayMax))
+        self.updateResponseTimeout()
+
+    def setResponseTimeout(self, delay):
+        """
+        Use a fixed response timeout (no rtt based adaptation)
+        """
+        self.setResponseTimeoutBounds(delay, delay)
+
+    def updateResponseTimeout(self):
+        if self._srtt is None:
+            # no rtt sample yet, be conservative
+            rto=self._delayResponseTimeoutMax
+        else:
+            rto=self._srtt+max(0.01, 4.0*self._rttvar)
+        self._rto=min(max(rto, self._delayResponseTimeoutMin), self._delayResponseTimeoutMax)
 
-    def setState(self, state, timeout=0):
-        self._state=state
-        self._timeout=time.time()+timeout
+    def updateRtt(self, rtt):
+        if rtt<0:
+            return
+        if self._srtt is None:
+            self._srtt=rtt
+            self._rttvar=rtt/2.0
+        else:
+            self._rttvar=0.75*self._rttvar+0.25*abs(self._srtt-rtt)
+            self._srtt=0.875*self._srtt+0.125*rtt
+        self.updateResponseTimeout()
+
+    def getResponseTimeout(self, request=None):
+        rto=self._rto
+        try:
+            # exponential backoff on retransmissions
+            if request._xmitCount>1:
+                rto*=2**(request._xmitCount-1)
+        except:
+            pass
+        return min(rto, self._delayResponseTimeoutMax)
+
+    @property
+    def rtt(self):
+        return self._srtt
+
+    def sampleRtt(self, request):
+        # Karn's algorithm : ambiguous samples (retransmitted request) are ignored
+        if not request.isRetransmitted():
+            self.updateRtt(time.time()-request._stamp)
 
     def setXmitInhibitDelay(self, delay):
         self._delayXmitInhibit=delay
@@ -84,13 +168,27 @@ class SAIALink(object):
                 self.logger.error('%s:link dead!' % self.server)
 
     def reset(self, success=False):
+        """
+        Terminate every pending request
+        """
+        for request in list(self._requests.values()):
+            self.terminate(request, success)
+        self.checkAlive()
+
+    def terminate(self, request, success=False):
         try:
-            self._request.stop(success)
+            del self._requests[request._sequence]
+        except:
+            pass
+
+        request._linkState=SAIALink.COMMSTATE_IDLE
+        try:
+            request.stop(success)
         except:
             pass
-        self._request=None
-        self.setState(SAIALink.COMMSTATE_IDLE)
-        self.checkAlive()
+
+        # a slot is now available for the next request
+        self.server.signalReady()
 
     def isAlive(self):
         if self._alive:
@@ -98,102 +196,134 @@ class SAIALink(object):
         return False
 
     def isIdle(self):
-        if self._state==SAIALink.COMMSTATE_IDLE:
+        """
+        True if no request is pending
+        """
+        if not self._requests:
             return True
         return False
 
-    def isWaitingResponse(self):
-        if self._state==SAIALink.COMMSTATE_WAITRESPONSE:
+    def isAvailable(self):
+        """
+        True if a new request can be initiated (free slot in the window)
+        """
+        if len(self._requests)<self._window:
             return True
         return False
 
-    def isTimeout(self):
-        if time.time()>=self._timeout:
-            return True
+    def isWaitingResponse(self):
+        for request in self._requests.values():
+            if request._linkState==SAIALink.COMMSTATE_WAITRESPONSE:
+                return True
         return False
 
-    def age(self):
-        return time.time()-self._timeout
+    def count(self):
+        return len(self._requests)
 
-    def isElapsed(self, age):
-        return self.age()>=age
+    def nextTimeout(self):
+        """
+        return the earliest pending request response (or xmit inhibit) timeout (or None)
+        """
+        timeout=None
+        for request in self._requests.values():
+            if request._linkState==SAIALink.COMMSTATE_WAITRESPONSE:
+                stamp=request._timeout
+            elif request._linkState==SAIALink.COMMSTATE_PENDINGREQUEST:
+                stamp=self._timeoutXmitInhibit
+            else:
+                continue
+            if timeout is None or stamp<timeout:
+                timeout=stamp
+        if timeout is None and self.isAlive():
+            timeout=self._timeoutWatchdog
+        return timeout
 
     def data2strhex(self, data):
         return ' '.join(x.encode('hex') for x in data)
 
+    def transmit(self, request):
+        if request.consumeRetry():
+            data=request.data
+            host=self.server.host
+            port=self.server.port
+            if request._broadcast:
+                host=self.server.node.broadcastAddress
+
+            if self.isDebug():
+                self.logger.debug('%s<--%s' % (host, request))
+
+            if self.server.node.sendMessageToHost(data, host, port=port):
+                self._msgcount+=1
+                self._timeoutXmitInhibit=time.time()+self._delayXmitInhibit
+                if request._broadcast:
+                    self.terminate(request, True)
+                else:
+                    request._linkState=SAIALink.COMMSTATE_WAITRESPONSE
+                    request._timeout=time.time()+self.getResponseTimeout(request)
+                    self.server.node.wakeupAt(request._timeout)
+                return True
+
+            self.terminate(request, False)
+            self.server.breaker.onFailure()
+            return
+
+        self.terminate(request, False)
+
     def manager(self):
         try:
-            if self._state==SAIALink.COMMSTATE_IDLE:
+            if not self._requests:
                 self.checkAlive()
                 return
 
-            elif self._state==SAIALink.COMMSTATE_PENDINGREQUEST:
-                if time.time()<self._timeoutXmitInhibit:
-                    return
-
-                if self._request.consumeRetry():
-                    data=self._request.data
-                    host=self.server.host
-                    port=self.server.port
-                    if self._request._broadcast:
-                        host=self.server.node.broadcastAddress
-
-                    if self.isDebug():
-                        self.logger.debug('%s<--%s' % (host, self._request))
-
-                    if self.server.node.sendMessageToHost(data, host, port=port):
-                        self._msgcount+=1
-                        self._timeoutXmitInhibit=time.time()+self._delayXmitInhibit
-                        if self._request._broadcast:
-                            self.setState(SAIALink.COMMSTATE_SUCCESS)
-                        else:
-                            self.setState(SAIALink.COMMSTATE_WAITRESPONSE, 3.0)
-                        return True
-                    else:
-                        self.setState(SAIALink.COMMSTATE_ERROR)
-                        self.server.pause(15.0)
+            activity=False
+            waiting=False
+            for request in list(self._requests.values()):
+                if request._linkState==SAIALink.COMMSTATE_PENDINGREQUEST:
+                    if time.time()<self._timeoutXmitInhibit:
+                        self.server.node.wakeupAt(self._timeoutXmitInhibit)
+                        continue
+                    if self.transmit(request):
+                        activity=True
 
-                self.reset()
-                return
+                elif request._linkState==SAIALink.COMMSTATE_WAITRESPONSE:
+                    if time.time()>=request._timeout:
+                        self.logger.error('%s-->%s:timeout!' % (self.server.host, request.__class__.__name__))
+                        request._linkState=SAIALink.COMMSTATE_PENDINGREQUEST
+                        activity=True
+                        # may abort every pending request
+                        self.server.breaker.onTimeout(request._stamp)
+                    else:
+                        waiting=True
 
-            elif self._state==SAIALink.COMMSTATE_WAITRESPONSE:
-                if self.isTimeout():
-                    self.logger.error('%s-->%s:timeout!' % (self.server.host, self._request.__class__.__name__))
-                    self.setState(SAIALink.COMMSTATE_PENDINGREQUEST)
+            if activity:
                 return True
 
-            elif self._state==SAIALink.COMMSTATE_ERROR:
-                if self.isElapsed(3.0):
-                    self.logger.error('link:error')
-                    self.reset()
-                return
-
-            elif self._state==SAIALink.COMMSTATE_SUCCESS:
-                self.reset(True)
+            # keep the polling node booster active while waiting for responses
+            # (an event driven node will be waked up by the response or the timeout)
+            if waiting and not self.server.node.isEventDriven():
                 return True
 
-            else:
-                self.logger.error('link:unkown state %d' % self._state)
-                self.setState(SAIALink.COMMSTATE_ERROR)
-                return
-
         except:
             self.logger.exception('link.manager')
-            self.setState(SAIALink.COMMSTATE_ERROR)
+            self.reset()
 
     def initiate(self, request):
         assert isinstance(request, SAIARequest)
-        if self.isIdle():
+        if self.isAvailable():
             try:
                 if request.isReady():
-                    self._request=request
-                    self._request.start()
-                    self.setState(SAIALink.COMMSTATE_PENDINGREQUEST)
+                    request.start()
+                    # allocate the request sequence
+                    request.build()
+                    request._linkState=SAIALink.COMMSTATE_PENDINGREQUEST
+                    request._timeout=0
+                    self._requests[request.sequence]=request
+                    self.server.signalReady()
                     return True
             except:
                 self.logger.exception('%s: initiate request!' % (self.server.host))
         else:
-            self.logger.error('%s: request %s denied (link not idle)!' % (self.server.host, request.__class__.__name__))
+            self.logger.error('%s: request %s denied (link busy)!' % (self.server.host, request.__class__.__name__))
 
     def readStationNumber(self):
         if self.isIdle():
@@ -215,64 +345,214 @@ class SAIALink(object):
             self.logger.exception('decodeMessage')
 
     def resetWatchdog(self):
+        self.server.breaker.onSuccess()
         self._alive=True
         self._timeoutWatchdog=time.time()+20.0
+        self.server.node.wakeupAt(self._timeoutWatchdog)
 
     def onMessage(self, mtype, mseq, payload):
         try:
             if mtype==0:    # Request
                 # must be intercepted at higher level
-                pass
+                return
 
-            elif mtype==1:  # Response
-                if self.isWaitingResponse():
-                    if self._request.validateMessage(mseq, payload):
-                        try:
-                            self.resetWatchdog()
-                            if self.isDebug():
-                                self.logger.debug('%s-->%s:processResponse(%d bytes)' % (self.server.host, self._request, len(payload)))
-                            result=self._request.processResponse(payload)
-                            self.reset(result)
-                        except:
-                            self.logger.exception('processResponse')
+            # a response to a retransmitted request is accepted until the request is terminated
+            request=self._requests.get(mseq)
+            if request is None or request._linkState==SAIALink.COMMSTATE_IDLE:
+                return
+
+            if mtype==1:  # Response
+                if request.validateMessage(mseq, payload):
+                    try:
+                        self.sampleRtt(request)
+                        self.resetWatchdog()
+                        if self.isDebug():
+                            self.logger.debug('%s-->%s:processResponse(%d bytes)' % (self.server.host, request, len(payload)))
+                        result=request.processResponse(payload)
+                        self.terminate(request, result)
+                    except:
+                        self.logger.exception('processResponse')
+                        self.terminate(request, False)
 
             elif mtype==2:  # Ack/Nak
-                if self.isWaitingResponse():
-                    if self._request.validateMessage(mseq):
-                        try:
-                            # (code,)=struct.unpack('>B', payload[0])
-                            data=struct.unpack('%dB' % len(payload), payload)
-
-                            code=data[0]
-                            # FIXME: meaning not clear yet (try to read an unexistant item,
-                            # like register 40000 -> returns am ACK with code=0 and code2=1)
-                            # code2=data[1]
-
-                            if code==0:
-                                self.resetWatchdog()
-                                if self.isDebug():
-                                    self.logger.debug('%s-->ACK(mseq=%d)' % (self.server.host, mseq))
-                                self.reset(True)
-                            else:
-                                if self.isDebug():
-                                    self.logger.error('%s-->NACK(mseq=%d, code=%d)' % (self.server.host, mseq, code))
-                                self.reset(False)
-                        except:
-                            self.logger.exception('processAck/Nak()')
-                            self.logger.warning(str(payload))
+                if request.validateMessage(mseq):
+                    try:
+                        # (code,)=struct.unpack('>B', payload[0])
+                        data=struct.unpack('%dB' % len(payload), payload)
+
+                        code=data[0]
+                        # FIXME: meaning not clear yet (try to read an unexistant item,
+                        # like register 40000 -> returns am ACK with code=0 and code2=1)
+                        # code2=data[1]
+
+                        self.sampleRtt(request)
+                        if code==0:
+                            self.resetWatchdog()
+                            if self.isDebug():
+                                self.logger.debug('%s-->ACK(mseq=%d)' % (self.server.host, mseq))
+                            self.terminate(request, True)
+                        else:
+                            if self.isDebug():
+                                self.logger.error('%s-->NACK(mseq=%d, code=%d)' % (self.server.host, mseq, code))
+                            self.terminate(request, False)
+                    except:
+                        self.logger.exception('processAck/Nak()')
+                        self.logger.warning(str(payload))
 
         except:
             self.logger.exception('onMessage')
 
     def __repr__(self):
-        return '<%s(state=%d, alive=%d, mseq=%d, mcount=%d)' % (self.__class__.__name__, self._state, bool(self.isAlive()), self._msgseq, self._msgcount)
+        rtt=-1.0
+        if self._srtt is not None:
+            rtt=self._srtt*1000.0
+        return '<%s(pending=%d/%d, alive=%d, mseq=%d, mcount=%d, rtt=%.1fms, rto=%.0fms)' % (self.__class__.__name__,
+            len(self._requests), self._window, bool(self.isAlive()), self._msgseq, self._msgcount,
+            rtt, self._rto*1000.0)
+
+
+class SAIACircuitBreaker(object):
+    """
+    Per server circuit breaker, driven by the link consecutive response timeouts.
+
+    CLOSED   : normal operation
+    OPEN     : the server is considered dead, every pending request is aborted and nothing is sent
+               to the server until the (exponential, jittered) backoff delay is elapsed
+    HALFOPEN : a single probe request is sent. A response closes the breaker, a timeout
+               re-opens it with a doubled backoff delay
+
+    Timeouts are counted once per transmission round : the requests sent before the last
+    counted timeout (i.e. the other requests of the window, lost in the same stall) don't
+    count as additional failures.
+    """
+
+    STATE_CLOSED = 0
+    STATE_OPEN = 1
+    STATE_HALFOPEN = 2
+
+    def __init__(self, server, threshold=3, delayMin=1.0, delayMax=60.0):
+        assert server.__class__.__name__=='SAIAServer'
+        self._server=server
+        self._state=self.STATE_CLOSED
+        self._threshold=threshold
+        self._delayMin=delayMin
+        self._delayMax=delayMax
+        self._failures=0
+        self._trips=0
+        self._timeout=0
+        self._stampFailure=0
+
+    @property
+    def server(self):
+        return self._server
+
+    @property
+    def logger(self):
+        return self.server.logger
+
+    @property
+    def state(self):
+        return self._state
+
+    def setThreshold(self, threshold):
+        self._threshold=max(1, int(threshold))
+
+    def setBackoffDelays(self, delayMin=1.0, delayMax=60.0):
+        self._delayMin=max(0.1, float(delayMin))
+        self._delayMax=max(self._delayMin, float(delayMax))
+
+    def isClosed(self):
+        if self._state==self.STATE_CLOSED:
+            return True
+        return False
+
+    def isOpen(self):
+        if self._state==self.STATE_OPEN:
+            return True
+        return False
+
+    def isHalfOpen(self):
+        if self._state==self.STATE_HALFOPEN:
+            return True
+        return False
+
+    def backoff(self):
+        delay=min(self._delayMax, self._delayMin*(2**min(self._trips, 16)))
+        # jitter, avoiding synchronized probes of every dead server
+        return delay*random.uniform(0.75, 1.25)
+
+    def open(self, delay=None):
+        if delay is None:
+            delay=self.backoff()
+            self._trips+=1
+        self._state=self.STATE_OPEN
+        self._timeout=time.time()+delay
+        self.server.node.wakeupAt(self._timeout)
+        self.logger.warning('server %s unreachable, circuit opened (%.1fs)' % (self.server, delay))
+        # don't burn timeouts on the pending requests
+        self.server.link.reset(False)
+
+    def close(self):
+        if self._state!=self.STATE_CLOSED:
+            self._state=self.STATE_CLOSED
+            self.logger.info('server %s reachable, circuit closed' % self.server)
+        self._trips=0
+        self._failures=0
+        self._stampFailure=0
+
+    def onTimeout(self, stamp=None):
+        """
+        response timeout of a request transmitted at the given stamp
+        """
+        if self._state==self.STATE_CLOSED and stamp is not None and stamp<self._stampFailure:
+            # same round as an already counted timeout
+            return
+        self._stampFailure=time.time()
+        self._failures+=1
+        if self._state==self.STATE_HALFOPEN:
+            self.open()
+        elif self._state==self.STATE_CLOSED and self._failures>=self._threshold:
+            self.open()
+
+    def onFailure(self):
+        """
+        unrecoverable link failure (i.e. socket error)
+        """
+        if self._state!=self.STATE_OPEN:
+            self.open()
+
+    def onSuccess(self):
+        self._failures=0
+        if self._state!=self.STATE_CLOSED:
+            self.close()
+
+    def onProbeDone(self, request, success):
+        """
+        probe request terminated : anything else than a response (NAK, cancel, abort) re-opens
+        the breaker (a response has already closed it)
+        """
+        if not success and self._state==self.STATE_HALFOPEN:
+            self.open()
+
+    def manager(self):
+        """
+        return True when a probe request has to be sent (open->halfopen transition)
+        """
+        if self._state==self.STATE_OPEN and time.time()>=self._timeout:
+            self._state=self.STATE_HALFOPEN
+            return True
+        return False
+
+    def __repr__(self):
+        return '<%s(state=%d, failures=%d, trips=%d)>' % (self.__class__.__name__,
+            self._state, self._failures, self._trips)
 
 
 class SAIAServer(object):
 
     UDP_DEFAULT_PORT = 5050
 
-    def __init__(self, node, host, lid=None, localNodeMode=False, mapfile=None, port=UDP_DEFAULT_PORT):
+    def __init__(self, node, host, lid=None, localNodeMode=False, mapfile=None, port=UDP_DEFAULT_PORT, memoryFile=None):
         assert node.__class__.__name__=='SAIANode'
         self._lock=RLock()
         self._node=node
@@ -282,7 +562,11 @@ class SAIAServer(object):
         self._host=host
         self._port=port or node._port
         self._lid=lid
-        self._memory=SAIAMemory(self, localNodeMode)
+        # SAIAServers ready queue/deadline scheduler state
+        self._readyQueued=False
+        self._deadline=None
+        self._memory=SAIAMemory(self, localNodeMode, memoryFile=memoryFile)
+        self._breaker=SAIACircuitBreaker(self)
         self._link=SAIALink(self)
         self._deviceInfo={}
         self._transfers=SAIATransferQueue(self)
@@ -394,6 +678,10 @@ class SAIAServer(object):
     def link(self):
         return self._link
 
+    @property
+    def breaker(self):
+        return self._breaker
+
     @property
     def inputs(self):
         return self.memory.inputs
@@ -422,6 +710,30 @@ class SAIAServer(object):
     def group(self, items=None):
         return SAIAItemGroup(items)
 
+    def readRange(self, key, index, count, out=None, timeout=15.0):
+        """
+        Raw (bulk) read of count items of the given type (I, O, F, R, T, C) starting at index,
+        without declaring items. The range is split into frames pipelined on the link, each
+        frame values being copied into its slice of the out buffer (i.e. an array, a numpy array
+        or a memoryview), 32 bits values or 0/1 bytes for booleans. By default, a new buffer is
+        allocated. Return the out buffer, or None in case of failure (timeout). Raise ValueError
+        if the range is out of the collection bounds
+        """
+        reader=SAIARangeRead(self.memory.collection(key), index, count, out)
+        reader.initiate()
+        if reader.wait(timeout):
+            return reader.out
+
+    def iterRange(self, key, index, count, out=None, timeout=15.0):
+        """
+        generator version of readRange(), yielding (index, values) blocks as soon as they are
+        received (values being a view on the out buffer)
+        """
+        reader=SAIARangeRead(self.memory.collection(key), index, count, out)
+        reader.initiate()
+        for block in reader.blocks(timeout):
+            yield block
+
     # secret helper allowing things like register=server.r8 to access registers[8]
     def __getattr__(self, name):
         try:
@@ -450,10 +762,17 @@ class SAIAServer(object):
     def isLocalNodeMode(self):
         return self._memory.isLocalNodeMode()
 
+    def setWindow(self, window):
+        """
+        Allow up to window simultaneous pending requests on the server link
+        """
+        self.link.setWindow(window)
+
     def pause(self, delay):
         timeout=time.time()+delay
         if timeout>self._timeoutPause:
             self._timeoutPause=timeout
+            self.node.wakeupAt(timeout)
             self.logger.warning('server %s paused (%ds)' % (self, delay))
 
     def enableNetworkScanner(self, state=True):
@@ -514,11 +833,47 @@ class SAIAServer(object):
         return self.memory.isPendingPushRequest()
 
     def onMessage(self, mtype, mseq, payload):
-        return self.link.onMessage(mtype, mseq, payload)
+        result=self.link.onMessage(mtype, mseq, payload)
+        self.signalReady()
+        return result
+
+    def signalReady(self):
+        """
+        Something has to be done by the server manager (queued item, transfer, received message, ...)
+        """
+        if self.isLocalNodeMode():
+            self.node.wakeup()
+        else:
+            self.node.servers.signalReady(self)
+
+    def nextDeadline(self):
+        """
+        return the time at which the server manager must be called again (if nothing
+        else signals the server as ready before)
+        """
+        if self._timeoutPause:
+            return self._timeoutPause
+        if self._breaker.isOpen():
+            return self._breaker._timeout
+        if self._breaker.isHalfOpen():
+            # waiting for the probe response (or timeout)
+            return self.link.nextTimeout()
+
+        deadlines=[self.link.nextTimeout()]
+        if self.isLidValid(self._lid):
+            deadlines.append(self._timeoutStatus)
+            deadlines.append(self._transfers.nextDeadline())
+            deadlines.append(self._memory.nextDeadline())
+        deadlines=[stamp for stamp in deadlines if stamp is not None]
+        if deadlines:
+            return min(deadlines)
 
     def refresh(self):
         self.memory.refresh()
 
+    def snapshot(self, formater=None):
+        return self.memory.snapshot(formater)
+
     def manager(self):
         activity=False
         if self._link.manager():
@@ -536,6 +891,7 @@ class SAIAServer(object):
             if self._networkScanner and time.time()>self._timeoutNetworkScanner:
                 self.submitTransferDiscoverNodes()
                 self._timeoutNetworkScanner=time.time()+60
+                self.node.wakeupAt(self._timeoutNetworkScanner)
         else:
             # ----------------------------------------------
             # Remote Servers
@@ -543,6 +899,13 @@ class SAIAServer(object):
                 if time.time()>self._timeoutPause:
                     self._timeoutPause=0
                     self.logger.info('server %s resumed' % self)
+            elif not self._breaker.isClosed():
+                # dead server : nothing else than a probe from time to time
+                if self._breaker.manager():
+                    if self.probe():
+                        activity=True
+                    else:
+                        self._breaker.open()
             else:
                 if self.isLidValid(self._lid):
                     if self._transfers.manager():
@@ -555,7 +918,8 @@ class SAIAServer(object):
                         self.refreshStatus()
                 else:
                     if self.link.isIdle():
-                        self.link.readStationNumber()
+                        if self.link.readStationNumber():
+                            activity=True
 
         if activity:
             # print ">SERVER"
@@ -563,6 +927,7 @@ class SAIAServer(object):
 
     def submitTransfer(self, transfer):
         self._transfers.submit(transfer)
+        self.signalReady()
         return transfer
 
     def submitTransferReadDeviceInformation(self):
@@ -594,28 +959,53 @@ class SAIAServer(object):
 
     def refreshStatus(self):
         self._timeoutStatus=time.time()+5.0
+        self.node.wakeupAt(self._timeoutStatus)
         transfer=SAIATransferFromRequest(SAIARequestReadPcdStatusOwn(self.link))
         return self.submitTransfer(transfer)
 
+    def probe(self):
+        """
+        direct (not queued) request used by the circuit breaker to check if the server is back
+        """
+        if self.isLidValid(self._lid):
+            request=SAIARequestReadPcdStatusOwn(self.link)
+        else:
+            request=SAIARequestReadStationNumber(self.link)
+        request._retry=1
+        request.addDoneCallback(self._breaker.onProbeDone)
+        return self.link.initiate(request)
+
     def ping(self):
         self.refreshStatus()
         return self.isAlive()
 
     def __repr__(self):
         count=self._transfers.count()
+        if not self._breaker.isClosed():
+            return '<%s(host=%s, lid=%d, alive=%d, circuit=OPEN)>' % (self.__class__.__name__, self.host, self.lid, self.isAlive())
         if count:
             return '<%s(host=%s, lid=%d, status=0x%02X, alive=%d, %d pending xfers)>' % (self.__class__.__name__, self.host, self.lid, self.status, self.isAlive(), count)
         return '<%s(host=%s, lid=%d, alive=%d, status=0x%02X)>' % (self.__class__.__name__, self.host, self.lid, self.isAlive(), self.status)
 
 
 class SAIAServers(object):
+    """
+    Remote servers collection. The manager only processes *ready* servers : those who have
+    been signaled (queued item, transfer, received message, ...) or whose deadline (as
+    given by server.nextDeadline() after each manager pass) is reached. The cost of a
+    manager pass depends on the number of active servers, not on the number of declared servers.
+    """
+
     def __init__(self, node):
         assert node.__class__.__name__=='SAIANode'
         self._node=node
         self._servers=[]
         self._indexByLid={}
         self._indexByHost={}
-        self._currentServer=0
+        self._lock=Lock()
+        self._ready=deque()
+        self._deadlines=[]
+        self._deadlinesCount=0
 
     @property
     def node(self):
@@ -676,6 +1066,7 @@ class SAIAServers(object):
             self._servers.append(server)
             self._indexByHost[host]=server
             self.logger.info('server(%s:%d:%s) declared' % (host, port, lid))
+            self.signalReady(server)
         return server
 
     def declareRange(self, ip, count, lid=None, port=SAIAServer.UDP_DEFAULT_PORT):
@@ -692,29 +1083,73 @@ class SAIAServers(object):
             self.logger.exception('declareRange')
         return servers
 
+    def signalReady(self, server):
+        with self._lock:
+            if server._readyQueued:
+                return
+            server._readyQueued=True
+            self._ready.append(server)
+        self.node.wakeup()
+
+    def schedule(self, server, stamp):
+        """
+        make the server ready at the given time (keep the earliest deadline)
+        """
+        if stamp is None:
+            return
+        with self._lock:
+            if server._deadline is not None and server._deadline<=stamp:
+                return
+            server._deadline=stamp
+            # the counter avoids comparing servers when stamps are equal
+            self._deadlinesCount+=1
+            heapq.heappush(self._deadlines, (stamp, self._deadlinesCount, server))
+        self.node.wakeupAt(stamp)
+
+    def countReady(self):
+        return len(self._ready)
+
     def manager(self):
         activity=False
 
-        if self._servers:
-            count=min(8, len(self._servers))
-            while count>0:
-                count-=1
-                try:
-                    server=self._servers[self._currentServer]
-                    self._currentServer+=1
+        now=time.time()
+        with self._lock:
+            # expired deadlines (obsolete heap entries are just dropped)
+            while self._deadlines and self._deadlines[0][0]<=now:
+                (stamp, count, server)=heapq.heappop(self._deadlines)
+                if server._deadline==stamp:
+                    server._deadline=None
+                    if not server._readyQueued:
+                        server._readyQueued=True
+                        self._ready.append(server)
+            count=len(self._ready)
+
+        # servers signaled during this pass will be processed on the next one
+        while count>0:
+            count-=1
+            with self._lock:
+                server=self._ready.popleft()
+                server._readyQueued=False
 
-                    try:
-                        if server.manager():
-                            activity=True
-                    except:
-                        self.logger.exception('manager')
-                except:
-                    self._currentServer=0
-                    break
+            try:
+                if server.manager():
+                    activity=True
+                    self.signalReady(server)
+                else:
+                    self.schedule(server, server.nextDeadline())
+            except:
+                self.logger.exception('manager')
+                self.schedule(server, time.time()+1.0)
 
         if activity:
             return True
 
+    def snapshot(self, formater=None):
+        """
+        return the memory snapshot of every server as {host: snapshot}
+        """
+        return {server.host: server.snapshot(formater) for server in self.all()}
+
     def count(self):
         return len(self._servers)
 
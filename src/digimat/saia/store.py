@@ -0,0 +1,386 @@
+from __future__ import division
+
+import time
+import struct
+from array import array
+from bisect import bisect_left
+
+from .bitset import SAIABitSet
+from .image import SAIAPagedImage
+from .image import UINT32BE
+
+
+class SAIAItemStore(object):
+    """
+    Columnar storage of an items collection. Each declared item gets a (stable) slot in
+    the value, stamp and flags columns. Declared indexes are kept sorted, with the slot
+    of each index in a parallel column. Items (SAIAItem) are only lightweight proxies on
+    this storage, created on demand.
+
+    Values that can't be stored in the values column (out of range, not an integer)
+    are kept aside in a dict. Pushed (pending write) values are kept in a dict too, as
+    only a few items are written.
+    """
+
+    FLAG_PUSH = 0x01
+    FLAG_PULL = 0x02
+    FLAG_VALUE = 0x04
+    FLAG_RAISED = 0x08
+    FLAG_CHANGED = 0x10
+    FLAG_UPDATED = 0x20
+    FLAG_READONLY = 0x40
+    FLAG_OBJECT = 0x80
+
+    def __init__(self, typecode='L'):
+        self._typecode=typecode
+        self._indexes=array('L')
+        self._slots=array('L')
+        self._values=array(typecode)
+        self._stamps=array('d')
+        self._flags=bytearray()
+        self._objects={}
+        self._pushValues={}
+
+    def count(self):
+        return len(self._stamps)
+
+    def __len__(self):
+        return self.count()
+
+    def indexes(self):
+        """
+        return the (sorted) declared indexes
+        """
+        return self._indexes
+
+    def position(self, index):
+        """
+        return the position of the index in the sorted indexes (or None)
+        """
+        n=bisect_left(self._indexes, index)
+        if n<len(self._indexes) and self._indexes[n]==index:
+            return n
+
+    def slot(self, index):
+        n=bisect_left(self._indexes, index)
+        if n<len(self._indexes) and self._indexes[n]==index:
+            return self._slots[n]
+
+    def add(self, index):
+        """
+        allocate a slot for the given index (or return the existing one)
+        """
+        n=bisect_left(self._indexes, index)
+        if n<len(self._indexes) and self._indexes[n]==index:
+            return self._slots[n]
+
+        slot=len(self._stamps)
+        self.allocate(slot, index)
+        self._stamps.append(0)
+        self._flags.append(0)
+        self._indexes.insert(n, index)
+        self._slots.insert(n, slot)
+        return slot
+
+    def allocate(self, slot, index):
+        self._values.append(0)
+
+    def getValue(self, slot):
+        if self._flags[slot] & self.FLAG_OBJECT:
+            return self._objects[slot]
+        return self._values[slot]
+
+    def setValue(self, slot, value):
+        try:
+            self._values[slot]=value
+            if self._flags[slot] & self.FLAG_OBJECT:
+                self._flags[slot]&=~self.FLAG_OBJECT
+                del self._objects[slot]
+        except (OverflowError, TypeError):
+            self._objects[slot]=value
+            self._flags[slot]|=self.FLAG_OBJECT
+
+    def getBytes(self, index, count):
+        """
+        return the values of the count indexes starting at index as big-endian UINT32
+        (frame payload), not declared indexes being read as 0
+        """
+        values=[0]*count
+        n=bisect_left(self._indexes, index)
+        while n<len(self._indexes) and self._indexes[n]<index+count:
+            values[self._indexes[n]-index]=self.getValue(self._slots[n])
+            n+=1
+        return struct.pack('>%dL' % count, *values)
+
+    def copyValues(self):
+        """
+        return a copy of the values column
+        """
+        return self._values[:]
+
+    def canAllocate(self, index):
+        """
+        return True if a value can be stored for the given (not yet declared) index
+        """
+        return True
+
+    def canAllocateRange(self, index, count):
+        """
+        return True if the values of the count indexes starting at index can be stored
+        """
+        return True
+
+    def refuse(self):
+        """
+        a write has been refused (see canAllocateRange)
+        """
+        pass
+
+    def isPersistent(self):
+        """
+        return True if the values survive a restart (the value of a just declared item is kept)
+        """
+        return False
+
+    def getPushValue(self, slot):
+        return self._pushValues.get(slot)
+
+    def setPushValue(self, slot, value):
+        self._pushValues[slot]=value
+
+    def getStamp(self, slot):
+        return self._stamps[slot]
+
+    def getOldestStamp(self, index, count):
+        """
+        return the oldest stamp of the declared indexes in range (None if none)
+        """
+        n0=bisect_left(self._indexes, index)
+        n1=bisect_left(self._indexes, index+count)
+        if n0<n1:
+            stamps=self._stamps
+            return min([stamps[slot] for slot in self._slots[n0:n1]])
+
+    def setStamp(self, slot, stamp):
+        self._stamps[slot]=stamp
+
+    def isFlag(self, slot, flag):
+        if self._flags[slot] & flag:
+            return True
+        return False
+
+    def setFlag(self, slot, flag):
+        self._flags[slot]|=flag
+
+    def clearFlag(self, slot, flag):
+        self._flags[slot]&=~flag
+
+    def testAndClearFlag(self, slot, flag):
+        if self._flags[slot] & flag:
+            self._flags[slot]&=~flag
+            return True
+        return False
+
+    def testAndSetFlag(self, slot, flag):
+        """
+        set the flag, returning its previous state
+        """
+        if self._flags[slot] & flag:
+            return True
+        self._flags[slot]|=flag
+        return False
+
+    def size(self):
+        """
+        return the approximate memory size (bytes) of the columns
+        """
+        size=0
+        for column in self.columns():
+            size+=column.buffer_info()[1]*column.itemsize
+        size+=len(self._flags)
+        return size
+
+    def columns(self):
+        return (self._indexes, self._slots, self._values, self._stamps)
+
+    def __repr__(self):
+        return '<%s(%d slots, %s, %d bytes)>' % (self.__class__.__name__,
+            self.count(), self._typecode, self.size())
+
+
+class SAIABooleanItemStore(SAIAItemStore):
+    """
+    Boolean items storage. Values are kept in an index addressed bitset (bit n is the
+    value of the item n, 8KB for the whole address space), with a second bitset marking
+    the declared indexes. Ranges of values can then be read and written as packed bytes
+    (frame payloads) without going through the items.
+    """
+
+    def __init__(self, buffer=None):
+        super(SAIABooleanItemStore, self).__init__('B')
+        self._values=None
+        self._slotIndexes=array('L')
+        self._bits=SAIABitSet(buffer=buffer)
+        self._declared=SAIABitSet()
+        self._persistent=(buffer is not None)
+
+    def isPersistent(self):
+        return self._persistent
+
+    def allocate(self, slot, index):
+        self._slotIndexes.append(index)
+        self._declared.set(index)
+
+    def columns(self):
+        return (self._indexes, self._slots, self._slotIndexes, self._stamps)
+
+    def size(self):
+        size=super(SAIABooleanItemStore, self).size()
+        return size+len(self._bits.data)+len(self._declared.data)
+
+    def getValue(self, slot):
+        return self._bits.get(self._slotIndexes[slot])
+
+    def setValue(self, slot, value):
+        self._bits.set(self._slotIndexes[slot], value)
+
+    def getBits(self, index, count):
+        """
+        return the values of the count indexes starting at index as an int (bit n is index+n)
+        """
+        return self._bits.getRange(index, count)
+
+    def setBits(self, index, count, bits, mask=None):
+        self._bits.setRange(index, count, bits, mask)
+
+    def canAllocate(self, index):
+        return index<self._bits.capacity()
+
+    def canAllocateRange(self, index, count):
+        return index+count<=self._bits.capacity()
+
+    def getDeclaredBits(self, index, count):
+        """
+        return the declared indexes in range as an int (bit n is set if index+n is declared)
+        """
+        return self._declared.getRange(index, count)
+
+    def getBytes(self, index, count):
+        """
+        return the values of the count indexes starting at index as packed bytes
+        """
+        return self._bits.getBytes(index, count)
+
+
+class SAIAImageItemStore(SAIAItemStore):
+    """
+    Local node analog items storage. Values are kept in a sparse index addressed memory image
+    of big-endian UINT32 (SAIAPagedImage, pages allocated on first write), so that the payload
+    of a read request response is a slice of the image, and reading unset addresses allocates
+    nothing. Values not fitting in an UINT32 (or refused by the image pages cap) are kept aside
+    (objects), and read as 0 in the image.
+    """
+
+    def __init__(self, size=65536, maxPages=None, buffer=None):
+        super(SAIAImageItemStore, self).__init__('L')
+        self._values=None
+        self._slotIndexes=array('L')
+        self._image=SAIAPagedImage(size, maxPages, buffer)
+        self._persistent=(buffer is not None)
+
+    def isPersistent(self):
+        return self._persistent
+
+    @property
+    def image(self):
+        return self._image
+
+    def allocate(self, slot, index):
+        self._slotIndexes.append(index)
+
+    def columns(self):
+        return (self._indexes, self._slots, self._slotIndexes, self._stamps)
+
+    def size(self):
+        return super(SAIAImageItemStore, self).size()+self._image.stats()['bytes']
+
+    def canAllocate(self, index):
+        return self._image.canAllocate(index)
+
+    def canAllocateRange(self, index, count):
+        return self._image.canAllocateRange(index, count)
+
+    def refuse(self):
+        self._image.refuse()
+
+    def getValue(self, slot):
+        if self._flags[slot] & self.FLAG_OBJECT:
+            return self._objects[slot]
+        return self._image.get(self._slotIndexes[slot])
+
+    def setValue(self, slot, value):
+        try:
+            if self._image.set(self._slotIndexes[slot], UINT32BE.pack(value)):
+                if self._flags[slot] & self.FLAG_OBJECT:
+                    self._flags[slot]&=~self.FLAG_OBJECT
+                    del self._objects[slot]
+                return
+        except struct.error:
+            self._image.set(self._slotIndexes[slot], bytes(4))
+        self._objects[slot]=value
+        self._flags[slot]|=self.FLAG_OBJECT
+
+    def getBytes(self, index, count):
+        return self._image.getBytes(index, count)
+
+    def copyValues(self):
+        image=self._image
+        return array(self._typecode, [image.get(index) for index in self._slotIndexes])
+
+    def stats(self):
+        return self._image.stats()
+
+
+class SAIATimerItemStore(SAIAItemStore):
+    """
+    Local timers storage. The values column holds the timer value at its stamp (the time it
+    was written), the current value being computed on read from the ticks elapsed since.
+    Running timers are then never rewritten : an idle timer costs nothing.
+    """
+
+    def __init__(self, tickBaseTime=0.01):
+        super(SAIATimerItemStore, self).__init__('L')
+        self._tickBaseTime=tickBaseTime
+
+    def setTickBaseTime(self, tickBaseTime):
+        self._tickBaseTime=tickBaseTime
+
+    def getValue(self, slot):
+        value=super(SAIATimerItemStore, self).getValue(slot)
+        try:
+            if value>0:
+                elapsed=int((time.time()-self._stamps[slot])/self._tickBaseTime)
+                return max(0, value-elapsed)
+        except TypeError:
+            pass
+        return value
+
+    def getDeadline(self, slot):
+        """
+        return the time at which the timer reaches 0 (None if not running)
+        """
+        if not self._flags[slot] & self.FLAG_OBJECT:
+            value=self._values[slot]
+            if value>0:
+                return self._stamps[slot]+value*self._tickBaseTime
+
+    def copyValues(self):
+        """
+        return the current values column
+        """
+        return array(self._typecode, [self.getValue(slot) if not self._flags[slot] & self.FLAG_OBJECT else 0
+            for slot in range(len(self._stamps))])
+
+
+if __name__ == "__main__":
+    pass
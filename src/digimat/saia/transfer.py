@@ -1,12 +1,16 @@
 from __future__ import division
 
 import time
+from threading import Lock
+from concurrent.futures import Future
 
 # python2-3 compatibility require 'pip install future'
 from queue import Queue
+from queue import Empty
 
 from .request import SAIARequestReadDBX
 from .request import SAIARequestReadStationNumber
+from .request import copyRangeValues
 
 
 class SAIATransfer(object):
@@ -61,6 +65,7 @@ class SAIATransfer(object):
 
     def heartbeat(self):
         self._timeoutWatchdog=time.time()+15.0
+        self.server.node.wakeupAt(self._timeoutWatchdog)
 
     def submitRequest(self, request):
         if request and not self._request:
@@ -135,7 +140,7 @@ class SAIATransfer(object):
                                 self.stop(False)
                         else:
                             if not self._request.isActive():
-                                if self.link.isIdle():
+                                if self.link.isAvailable():
                                     self._request.initiate()
                                     activity=True
                     else:
@@ -228,6 +233,124 @@ class SAIATransferFromRequest(SAIATransfer):
         self.submitRequest(self._wrappedRequest)
 
 
+class SAIARangeRead(object):
+    """
+    Raw read of an items range, split into frame sized read requests pipelined on the
+    server link. Each frame values are copied into their slice of the out buffer, without
+    items objects. Raise ValueError if the range is out of the collection bounds
+    """
+
+    def __init__(self, collection, index, count, out=None):
+        if count<0 or index<0 or index+count>collection.getMaxSize():
+            raise ValueError('invalid range (index=%d, count=%d)' % (index, count))
+        self._collection=collection
+        self._index=index
+        self._count=count
+        if out is None:
+            out=collection.createRangeBuffer(count)
+        self._out=out
+        self._requests=[]
+        self._pending=0
+        self._failed=0
+        self._lock=Lock()
+        self._future=Future()
+        self._queue=Queue()
+
+    @property
+    def out(self):
+        return self._out
+
+    @property
+    def future(self):
+        return self._future
+
+    def initiate(self):
+        collection=self._collection
+        if self._count==0:
+            self._future.set_result(True)
+            return
+
+        if collection.isLocalNodeMode():
+            copyRangeValues(self._out, 0, collection.getRangeValues(self._index, self._count))
+            self._future.set_result(True)
+            return
+
+        maxcount=collection.FRAME_MAXCOUNT
+        requests=[]
+        for offset in range(0, self._count, maxcount):
+            request=collection.createReadRangeRequest()
+            request.setup(self._index+offset, min(maxcount, self._count-offset), self._out, offset)
+            request.addDoneCallback(self.onFrameDone)
+            requests.append(request)
+
+        with self._lock:
+            self._requests=requests
+            self._pending=len(requests)
+        for request in requests:
+            collection.memory.submitRead(request)
+
+    def onFrameDone(self, request, success):
+        with self._lock:
+            self._pending-=1
+            if not success:
+                self._failed+=1
+            done=(self._pending==0)
+        self._queue.put((request, success))
+        if done and not self._future.done():
+            self._future.set_result(self._failed==0)
+
+    def cancel(self):
+        """
+        cancel the not yet sent frames, the frames still in flight being detached from the
+        out buffer (no more written once the read has failed)
+        """
+        for request in self._requests:
+            request.cancel()
+            request.detach()
+
+    def wait(self, timeout=15.0):
+        """
+        wait for the whole range, returning True if every frame succeeded
+        """
+        try:
+            if timeout is not None and timeout<=0:
+                timeout=None
+            return self._future.result(timeout)
+        except:
+            self.cancel()
+        return False
+
+    def view(self, offset, count):
+        try:
+            return memoryview(self._out)[offset:offset+count]
+        except TypeError:
+            return self._out[offset:offset+count]
+
+    def blocks(self, timeout=15.0):
+        """
+        generator yielding (index, values) for each frame as soon as it is received,
+        values being a view on the out buffer. Stop on the first failed frame or on timeout
+        """
+        if self._collection.isLocalNodeMode():
+            yield (self._index, self.view(0, self._count))
+            return
+
+        timeout=time.time()+timeout
+        for n in range(len(self._requests)):
+            try:
+                (request, success)=self._queue.get(timeout=max(0, timeout-time.time()))
+            except Empty:
+                success=False
+            if not success:
+                self.cancel()
+                return
+            yield (request.index, self.view(request.offset, request.count))
+
+    def __repr__(self):
+        return '<%s(index=%d, count=%d, frames=%d, pending=%d, failed=%d)>' % (self.__class__.__name__,
+            self._index, self._count, len(self._requests), self._pending, self._failed)
+
+
 class SAIATransferQueue(object):
     def __init__(self, server):
         assert server.__class__.__name__=='SAIAServer'
@@ -259,6 +382,15 @@ class SAIATransferQueue(object):
             self.logger.debug('queue:%s (size=%d)' % (transfer.__class__.__name__,
                                     self._queue.qsize()))
 
+    def nextDeadline(self):
+        """
+        return the current transfer watchdog timeout (or now if there is a queued transfer)
+        """
+        if self._transfer:
+            return self._transfer._timeoutWatchdog
+        if self.count()>0:
+            return time.time()
+
     def getNextTransfer(self):
         try:
             return self._queue.get(False)
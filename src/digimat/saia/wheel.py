@@ -0,0 +1,86 @@
+from __future__ import division
+
+import heapq
+
+
+class SAIATimerWheel(object):
+    """
+    Hashed timer wheel. Keys are stored in time slots (slot n covers the stamps in
+    ](n-1)*resolution, n*resolution]), the expired slots being collected in time order.
+    Adding, moving or removing a key is O(1) (a removed key leaves its slot to be
+    skipped), and an idle wheel costs nothing.
+    """
+
+    def __init__(self, resolution=0.1):
+        self._resolution=resolution
+        self._slots={}
+        self._keys={}
+        self._heap=[]
+
+    def count(self):
+        return len(self._keys)
+
+    def __len__(self):
+        return self.count()
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def add(self, key, stamp):
+        """
+        (re)schedule the key at the given time.time() stamp, returning the time
+        at which its slot expires
+        """
+        slot=int(stamp/self._resolution)+1
+        if self._keys.get(key)==slot:
+            return slot*self._resolution
+        self.remove(key)
+        keys=self._slots.get(slot)
+        if keys is None:
+            keys=set()
+            self._slots[slot]=keys
+            heapq.heappush(self._heap, slot)
+        keys.add(key)
+        self._keys[key]=slot
+        return slot*self._resolution
+
+    def remove(self, key):
+        slot=self._keys.pop(key, None)
+        if slot is not None:
+            keys=self._slots[slot]
+            keys.discard(key)
+            if not keys:
+                del self._slots[slot]
+
+    def expire(self, now):
+        """
+        remove and return the keys whose stamp is reached
+        """
+        expired=[]
+        last=int(now/self._resolution)
+        while self._heap and self._heap[0]<=last:
+            slot=heapq.heappop(self._heap)
+            keys=self._slots.pop(slot, None)
+            if keys:
+                for key in keys:
+                    del self._keys[key]
+                expired.extend(keys)
+        return expired
+
+    def nextDeadline(self):
+        """
+        return the time at which the next slot expires (or None)
+        """
+        while self._heap:
+            slot=self._heap[0]
+            if slot in self._slots:
+                return slot*self._resolution
+            heapq.heappop(self._heap)
+
+    def __repr__(self):
+        return '<%s(%d keys, %d slots, resolution=%.02fs)>' % (self.__class__.__name__,
+            len(self._keys), len(self._slots), self._resolution)
+
+
+if __name__ == "__main__":
+    pass